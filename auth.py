@@ -1,27 +1,62 @@
 import hmac
 import hashlib
+import threading
 import time
+from urllib.parse import urlencode
 
-def generate_auth_headers_for_user(endpoint, method='GET', query_params=None, api_key=None, api_secret=None):
-    nonce = str(int(time.time() * 1000))
 
+def encode_query(params):
+    # The exact query string requests would send for these params, in their order
+    return urlencode(list(params.items()) if params else [])
+
+
+class BitsoSigner:
+    """
+    Signs requests for one API key. The HMAC is keyed once and copied per
+    request, and nonces strictly increase even when several threads or
+    asyncio tasks sign in the same millisecond, as Bitso rejects a repeated
+    nonce. Use get_signer so every account sharing a key shares its nonces.
+    """
+
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self._keyed = hmac.new(api_secret.encode('utf-8'), digestmod=hashlib.sha256)
+        self._last_nonce = 0
+        self._lock = threading.Lock()
+
+    def next_nonce(self):
+        with self._lock:
+            self._last_nonce = max(self._last_nonce + 1, int(time.time() * 1000))
+            return self._last_nonce
+
+    def headers(self, method, path):
+        """`path` is the endpoint plus '?query' exactly as it goes on the wire."""
+        nonce = str(self.next_nonce())
+        mac = self._keyed.copy()
+        mac.update((nonce + method + path).encode('utf-8'))
+        return {
+            'Authorization': f'Bitso {self.api_key}:{nonce}:{mac.hexdigest()}',
+            'Content-Type': 'application/json'
+        }
+
+
+_signers = {}
+_signers_lock = threading.Lock()
+
+
+def get_signer(api_key, api_secret):
+    with _signers_lock:
+        signer = _signers.get((api_key, api_secret))
+        if signer is None:
+            signer = _signers[(api_key, api_secret)] = BitsoSigner(api_key, api_secret)
+        return signer
+
+
+def generate_auth_headers_for_user(endpoint, method='GET', query_params=None, api_key=None, api_secret=None):
     # Sort and build query string
-    query_string = ''
     if query_params:
-        sorted_params = sorted(query_params.items())
-        query_string = '&'.join([f"{k}={v}" for k, v in sorted_params])
-        endpoint_with_query = f"{endpoint}?{query_string}"
+        endpoint_with_query = f"{endpoint}?{encode_query(dict(sorted(query_params.items())))}"
     else:
         endpoint_with_query = endpoint
 
-    message = nonce + method + endpoint_with_query
-    signature = hmac.new(
-        api_secret.encode('utf-8'),
-        message.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
-
-    return {
-        'Authorization': f'Bitso {api_key}:{nonce}:{signature}',
-        'Content-Type': 'application/json'
-    }
+    return get_signer(api_key, api_secret).headers(method, endpoint_with_query)
@@ -0,0 +1,39 @@
+"""
+Pages every account's whole funding history into the local store. Safe to
+interrupt: running it again resumes each account after its last stored page.
+"""
+import argparse
+import sys
+
+from core.backfill import run_backfill, BACKFILL_RESUMES, BACKFILL_LOCKOUT_WAIT
+from core.metrics import set_verbose
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resumable full-history backfill of Bitso fundings.')
+    parser.add_argument('-u', '--user', action='append', dest='users', metavar='USER',
+                        help='Only backfill this account (default: all). Repeat for several.')
+    parser.add_argument('--restart', action='store_true', help='Drop the checkpoints and start from the newest page')
+    parser.add_argument('--resumes', type=int, default=BACKFILL_RESUMES,
+                        help=f'Times to resume an account after its retries run out (default: {BACKFILL_RESUMES})')
+    parser.add_argument('--lockout-wait', type=float, default=BACKFILL_LOCKOUT_WAIT,
+                        help=f'Seconds to wait before resuming (default: {BACKFILL_LOCKOUT_WAIT})')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print a line for every fetched page')
+    args = parser.parse_args(argv)
+
+    if args.quiet:
+        set_verbose(False)
+
+    try:
+        failed = run_backfill(args.users, args.restart, args.resumes, args.lockout_wait)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if failed:
+        print(f"\nBackfill incomplete for: {', '.join(failed)}. Run again to resume.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
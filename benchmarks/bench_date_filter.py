@@ -0,0 +1,86 @@
+"""
+Compares the old per-record created_at parsing with the columnar path in
+core.dates, for the month filter and the Mexico City export column.
+
+    python -m benchmarks.bench_date_filter [records]
+"""
+import sys
+import time
+from datetime import datetime, date, timedelta, timezone
+import pytz
+from dateutil import parser
+
+from core.dates import parse_local_created_at
+from core.flatten import flatten_fundings
+from core.filter_data import select_fundings_between
+
+
+def make_fundings(n):
+    start = datetime(2025, 7, 31, 23, 0, tzinfo=timezone.utc)
+    fundings = []
+    for i in range(n):
+        created = start - timedelta(minutes=7 * i)
+        fundings.append({'fid': str(i), 'created_at': created.strftime("%Y-%m-%dT%H:%M:%S+00:00")})
+    # A few malformed dates, which both paths must skip
+    fundings[10]['created_at'] = 'not-a-date'
+    fundings[20]['created_at'] = None
+    return fundings
+
+
+def per_record_filter(fundings, start_date, end_date):
+    mexico_tz = pytz.timezone('America/Mexico_City')
+    filtered = []
+    for f in fundings:
+        created_str = f.get('created_at')
+        if not created_str:
+            continue
+        try:
+            created_local = parser.isoparse(created_str).astimezone(mexico_tz).date()
+            if start_date <= created_local <= end_date:
+                filtered.append(f)
+        except Exception:
+            pass
+    return filtered
+
+
+def per_record_export_dates(fundings):
+    mexico_tz = pytz.timezone('America/Mexico_City')
+    out = []
+    for f in fundings:
+        try:
+            utc_dt = datetime.strptime(f.get('created_at'), "%Y-%m-%dT%H:%M:%S+00:00").replace(tzinfo=pytz.UTC)
+            out.append(utc_dt.astimezone(mexico_tz).strftime("%Y-%m-%d %H:%M:%S"))
+        except Exception:
+            out.append('')
+    return out
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    fundings = make_fundings(n)
+    start_date, end_date = date(2025, 7, 1), date(2025, 7, 31)
+
+    print(f"{n:,} records")
+
+    old, old_s = timed(per_record_filter, fundings, start_date, end_date)
+    new, new_s = timed(select_fundings_between, fundings, start_date, end_date)
+    assert [f['fid'] for f in old] == [f['fid'] for f in new]
+    print(f"month filter:   per-record {old_s:.3f}s  columnar {new_s:.3f}s  ({old_s / new_s:.1f}x)")
+
+    old, old_s = timed(per_record_export_dates, fundings)
+    table, new_s = timed(flatten_fundings, fundings, False)
+    assert old == table['Date (Mexico City)'].tolist()
+    print(f"export dates:   per-record {old_s:.3f}s  flatten {new_s:.3f}s  ({old_s / new_s:.1f}x)")
+
+    _, parse_s = timed(parse_local_created_at, fundings, False)
+    print(f"parse only:     columnar {parse_s:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
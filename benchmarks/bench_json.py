@@ -0,0 +1,71 @@
+"""
+Compares the JSON backends of core.jsonfast on the two hot paths: decoding
+API pages (100 fundings each) and the per-record store round trip.
+Backends that are not installed are skipped.
+
+    python -m benchmarks.bench_json [records]
+"""
+import json
+import sys
+import time
+
+from benchmarks.mock_bitso import FundingHistory
+from core import jsonfast
+
+PAGE_SIZE = 100
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def each(fn, items):
+    # Results are dropped straight away, as the paging loop does, so GC of a growing list is not timed
+    for item in items:
+        fn(item)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    history = FundingHistory(n)
+    fundings = [history.funding(i) for i in range(n)]
+    pages = [json.dumps({'success': True, 'payload': fundings[i:i + PAGE_SIZE]}).encode('utf-8')
+             for i in range(0, n, PAGE_SIZE)]
+    rows = [json.dumps(f) for f in fundings]
+
+    def response_json():
+        # The previous path: requests' response.json(), i.e. the stdlib on the decoded text
+        for page in pages:
+            json.loads(page.decode('utf-8')).get('payload', [])
+
+    print(f"{n:,} records in {len(pages):,} pages")
+    baseline = best_of(response_json)
+    print(f"{'response.json()':<18}pages {n / baseline:>11,.0f} rec/s")
+
+    reference = [f for page in pages for f in json.loads(page)['payload']]
+    for name in jsonfast.BACKENDS:
+        try:
+            jsonfast.use_backend(name)
+        except ImportError:
+            print(f"{name:<18}not installed")
+            continue
+
+        decoded = [f for page in pages for f in jsonfast.decode_page(page)]
+        assert [f['fid'] for f in decoded] == [f['fid'] for f in reference]
+
+        page_s = best_of(lambda: each(jsonfast.decode_page, pages))
+        load_s = best_of(lambda: each(jsonfast.loads, rows))
+        dump_s = best_of(lambda: each(jsonfast.dumps, fundings))
+        print(f"{name:<18}pages {n / page_s:>11,.0f} rec/s ({baseline / page_s:.1f}x)  "
+              f"store read {n / load_s:>11,.0f} rec/s  store write {n / dump_s:>11,.0f} rec/s")
+
+    jsonfast.use_backend(jsonfast.JSON_BACKEND)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Memory footprint of a batch of fundings as raw API dicts against the compact
+flattened table the report stages work on (category codes, interned sender
+strings, only the reported fields).
+
+    python -m benchmarks.bench_records [records]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.mock_bitso import FundingHistory
+from core.flatten import flatten_fundings, CATEGORICAL_COLUMNS
+
+
+def decoded_page(n):
+    # Through JSON, so every string is a separate object as after response.json()
+    history = FundingHistory(n)
+    return json.dumps([history.funding(i) for i in range(n)])
+
+
+def traced(build):
+    """Bytes still allocated once build() has returned, with tracing around all of it."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def decode_and_flatten(raw):
+    # The dicts are dropped once flattened, as the report stages do, so only what the table holds counts
+    fundings = json.loads(raw)
+    return flatten_fundings(fundings, report_bad=False)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = decoded_page(n)
+
+    _, dict_bytes = traced(lambda: json.loads(raw))
+    table, table_bytes = traced(lambda: decode_and_flatten(raw))
+    categorical_bytes = table[list(CATEGORICAL_COLUMNS)].memory_usage(deep=True, index=False).sum()
+
+    started = time.perf_counter()
+    flatten_fundings(json.loads(raw), report_bad=False)
+    elapsed = time.perf_counter() - started
+
+    print(f"{n:,} records")
+    print(f"raw dicts:      {dict_bytes / 2 ** 20:8.1f} MB  ({dict_bytes / n:,.0f} B/record)")
+    print(f"compact table:  {table_bytes / 2 ** 20:8.1f} MB  ({table_bytes / n:,.0f} B/record)  "
+          f"{dict_bytes / table_bytes:.1f}x smaller")
+    print(f"  {len(CATEGORICAL_COLUMNS)} categorical columns: {categorical_bytes / 2 ** 20:.2f} MB")
+    print(f"decode + flatten: {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
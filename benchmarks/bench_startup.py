@@ -0,0 +1,79 @@
+"""
+Import-time report of the entry points, from `python -X importtime`. Lists
+each entry point's total import time and its heaviest packages, and checks
+that check_new stays within its startup budget and that neither it nor the
+report entry points load pandas or matplotlib before their report stages run.
+
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 250]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ('check_new', 'main', 'report', 'main_july')
+# Packages these entry points must not pull in at import time
+HEAVY = ('pandas', 'matplotlib', 'pyarrow', 'numpy')
+LIGHT_ENTRY_POINTS = ('check_new', 'main', 'report')
+CHECK_BUDGET_MS = 250
+
+
+def import_times(module):
+    """Returns {module: cumulative microseconds} for one cold `import module`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    )
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        times[name] = int(cumulative)
+    return times
+
+
+def report(module, runs, top=8):
+    samples = [import_times(module) for _ in range(runs)]
+    total_ms = statistics.median(s[module] for s in samples) / 1000
+    last = samples[-1]
+
+    # Top-level packages only, so pandas is not listed again as pandas.core.*
+    packages = {name: us for name, us in last.items() if '.' not in name.lstrip() and name != module}
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    print(f"\n{module}: {total_ms:.0f} ms (median of {runs})")
+    for name, us in heaviest:
+        print(f"  {name:<24}{us / 1000:>8.1f} ms")
+    return total_ms, {name.strip() for name in last}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time report of the entry points.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=CHECK_BUDGET_MS,
+                        help=f'Import budget of check_new (default: {CHECK_BUDGET_MS})')
+    args = parser.parse_args(argv)
+
+    results = {module: report(module, args.runs) for module in ENTRY_POINTS}
+
+    print()
+    heavy_found = False
+    for module in LIGHT_ENTRY_POINTS:
+        heavy = sorted(name for name in HEAVY if name in results[module][1])
+        if heavy:
+            print(f"{module} imports {', '.join(heavy)}")
+            heavy_found = True
+
+    check_ms = results['check_new'][0]
+    ok = check_ms <= args.budget_ms and not heavy_found
+    print(f"check_new: {check_ms:.0f} ms of {args.budget_ms:.0f} ms budget ({'OK' if ok else 'OVER'})")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Local stand-in for Bitso's /v3/fundings, for benchmarking without live keys.
+
+Serves a deterministic synthetic history newest-first with marker (fid)
+pagination, checks the HMAC Authorization header the same way Bitso does,
+and can inject latency, 429s with Retry-After, and dropped connections.
+
+    python -m benchmarks.mock_bitso --records 100000 --latency 0.05 --rate-429 0.01
+
+Point config.BASE_URL at the printed URL and use the key/secret it prints.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+DEFAULT_KEY = 'bench-key'
+DEFAULT_SECRET = 'bench-secret'
+
+SENDERS = [
+    ('JUAN PEREZ LOPEZ', 'PELJ800101HDFRPN09', 'BBVA MEXICO'),
+    ('MARIA GUADALUPE HERNANDEZ', 'HEGM750315MJCRRD02', 'BANORTE'),
+    ('COMERCIALIZADORA DEL NORTE SA DE CV', 'CNO120101AB1', 'SANTANDER'),
+    ('JOSÉ ÁNGEL MUÑOZ', 'MUAJ900720HNLXNS05', 'BANAMEX'),
+    ('SERVICIOS INTEGRALES GAMA SC', 'SIG150505XY2', 'HSBC'),
+    ('ANA SOFIA RAMIREZ', 'RASA880912MDFMFN01', 'STP'),
+    ('LUIS FERNANDO TORRES', 'TOFL850228HDFRRS07', 'NU MEXICO'),
+]
+
+
+class FundingHistory:
+    """
+    `records` synthetic fundings, built on demand from their index so a
+    million-record history costs no memory. Index 0 is the newest; its fid is
+    the largest, and fids count down from there.
+    """
+
+    def __init__(self, records, newest=None, spacing=timedelta(minutes=7), seed=7):
+        self.records = records
+        self.newest = newest or datetime.now(timezone.utc).replace(microsecond=0)
+        self.spacing = spacing
+        self.seed = seed
+
+    def fid(self, index):
+        return f'{self.records - index:012d}'
+
+    def index_of(self, fid):
+        try:
+            return self.records - int(fid)
+        except ValueError:
+            return None
+
+    def funding(self, index):
+        # Seeded by fid, so a record keeps its content as newer ones arrive;
+        # only the newest few are still pending
+        number = self.records - index
+        rng = random.Random(self.seed * 1_000_003 + number)
+        name, rfc, bank = SENDERS[rng.randrange(len(SENDERS))]
+        sender_number = SENDERS.index((name, rfc, bank))
+        roll = rng.random()
+        if index < 20 and roll > 0.7:
+            status = 'pending'
+        elif roll < 0.05:
+            status = 'failed'
+        else:
+            status = 'complete'
+        created = self.newest - self.spacing * index
+
+        return {
+            'fid': self.fid(index),
+            'status': status,
+            'created_at': created.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+            'amount': f'{rng.randrange(10_000, 5_000_000) / 100:.2f}',
+            'currency': 'mxn',
+            'asset': 'mxn',
+            'method': 'praxis',
+            'method_name': 'SPEI Transfer',
+            'network': 'spei',
+            'protocol': 'clabe',
+            'integration': 'praxis',
+            'details': {
+                'sender_name': name,
+                'sender_ref': str(rng.randrange(1_000_000)),
+                'sender_clabe': f'0121800{sender_number:011d}',
+                'receive_clabe': '710969000012345678',
+                'sender_bank': bank,
+                'clave': str(rng.randrange(10 ** 9)),
+                'clave_rastreo': f'MBAN{rng.randrange(10 ** 16):016d}',
+                'numeric_reference': str(rng.randrange(10 ** 7)),
+                'concepto': rng.choice(['PAGO', 'TRANSFERENCIA', 'RENTA', 'FACTURA 1234']),
+                'cep_link': f'https://www.banxico.org.mx/cep/go?i=90646&s=20210302&d={number}',
+                'sender_rfc_curp': rfc,
+                'deposit_type': 'third_party',
+                'notes': None,
+                'emoji': None,
+            },
+            'legal_operation_entity': {
+                'name': 'Bitso Mexico',
+                'country_code_iso_2': 'MX',
+                'image_id': 'bitso_mx',
+            },
+        }
+
+    def page(self, marker, limit):
+        start = 0
+        if marker:
+            start = self.index_of(marker)
+            if start is None:
+                return None
+            start += 1
+        end = min(self.records, start + limit)
+        return [self.funding(i) for i in range(start, end)]
+
+
+class MockBitsoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, code, message, headers=None):
+        self._send_json(status, {'success': False, 'error': {'code': code, 'message': message}}, headers)
+
+    def _check_auth(self):
+        server = self.server
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Bitso '):
+            return 'Missing Bitso authorization header'
+        try:
+            key, nonce, signature = header[len('Bitso '):].split(':')
+        except ValueError:
+            return 'Malformed authorization header'
+
+        secret = server.credentials.get(key)
+        if secret is None:
+            return 'Unknown API key'
+
+        # Bitso signs the path exactly as the request line carries it
+        message = nonce + self.command + self.path
+        expected = hmac.new(secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            return 'Invalid signature'
+
+        if server.strict_nonce:
+            with server.lock:
+                if int(nonce) <= server.last_nonce.get(key, 0):
+                    return 'Invalid nonce'
+                server.last_nonce[key] = int(nonce)
+        return None
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.stats['requests'] += 1
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+
+        if server.disconnect_rate and random.random() < server.disconnect_rate:
+            with server.lock:
+                server.stats['disconnects'] += 1
+            self.close_connection = True
+            self.connection.close()
+            return
+
+        if server.rate_429 and random.random() < server.rate_429:
+            with server.lock:
+                server.stats['rate_limited'] += 1
+            self._error(429, '0201', 'Too many requests', {'Retry-After': str(server.retry_after)})
+            return
+
+        parts = urlsplit(self.path)
+        if parts.path != '/v3/fundings':
+            self._error(404, '0404', 'Not found')
+            return
+
+        auth_error = self._check_auth()
+        if auth_error:
+            with server.lock:
+                server.stats['auth_failures'] += 1
+            self._error(401, '0201', auth_error)
+            return
+
+        query = parse_qs(parts.query)
+        limit = min(int(query.get('limit', ['25'])[0]), 100)
+        marker = query.get('marker', [None])[0]
+        page = server.history.page(marker, limit)
+        if page is None:
+            self._error(400, '0302', 'Unknown marker')
+            return
+
+        with server.lock:
+            server.stats['records'] += len(page)
+        self._send_json(200, {'success': True, 'payload': page})
+
+
+class MockBitsoServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, history, credentials=None, latency=0.0, rate_429=0.0,
+                 retry_after=1, disconnect_rate=0.0, strict_nonce=True):
+        super().__init__(address, MockBitsoHandler)
+        self.history = history
+        self.credentials = credentials or {DEFAULT_KEY: DEFAULT_SECRET}
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.disconnect_rate = disconnect_rate
+        self.strict_nonce = strict_nonce
+        self.last_nonce = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'records': 0, 'rate_limited': 0, 'disconnects': 0, 'auth_failures': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_mock_server(records, port=0, **options):
+    """Starts a MockBitsoServer on a background thread. Call .shutdown() when done."""
+    server = MockBitsoServer(('127.0.0.1', port), FundingHistory(records), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Bitso /v3/fundings locally.')
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean seconds added to every response')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0, help='Share of connections dropped')
+    parser.add_argument('--no-strict-nonce', action='store_true', help='Accept repeated or decreasing nonces')
+    args = parser.parse_args()
+
+    server = MockBitsoServer(
+        ('127.0.0.1', args.port), FundingHistory(args.records), latency=args.latency,
+        rate_429=args.rate_429, retry_after=args.retry_after, disconnect_rate=args.disconnect_rate,
+        strict_nonce=not args.no_strict_nonce
+    )
+    print(f"Mock Bitso serving {args.records:,} fundings at {server.base_url}")
+    print(f"API key: {DEFAULT_KEY}  secret: {DEFAULT_SECRET}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
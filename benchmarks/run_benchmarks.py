@@ -0,0 +1,207 @@
+"""
+Offline end-to-end benchmark against the local mock server in
+benchmarks.mock_bitso. For every size it syncs a synthetic account into a
+scratch store, then runs the report stages batch by batch and reports, per
+stage, throughput, p50/p95/p99 latency per page or batch, and peak memory.
+
+    python -m benchmarks.run_benchmarks [--sizes 1000,100000,1000000] [--json results.json]
+
+Memory is measured in a second, tracemalloc-traced pass so it does not skew
+the timings; --no-memory skips it. --latency, --rate-429 and
+--disconnect-rate are passed on to the mock server.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from benchmarks.mock_bitso import DEFAULT_KEY, DEFAULT_SECRET, start_mock_server
+from core.client import BitsoClient
+from core.fetch_funding import iter_funding_pages
+from core.store import open_store, upsert_fundings, iter_fundings, READ_BATCH_SIZE
+from core.periods import this_month
+from core.filter_data import period_mask
+from core.flatten import flatten_fundings
+from core.filter_sender import GroupedTotals, GROUPINGS
+from core.export import open_funding_writer, failed_view
+from core.chart import add_daily_income, render_growth_charts
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+USER = 'bench'
+
+STAGES = ('fetch', 'store', 'read', 'flatten', 'filter', 'export', 'aggregate', 'chart')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Stage:
+    """Time, records and incremental peak memory of one pipeline stage."""
+
+    def __init__(self, name, trace):
+        self.name = name
+        self.trace = trace
+        self.samples = []
+        self.records = 0
+        self.peak_bytes = 0
+
+    @contextlib.contextmanager
+    def measure(self, records=0):
+        if self.trace:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        yield
+        self.samples.append(time.perf_counter() - started)
+        self.records += records
+        if self.trace:
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1] - baseline)
+
+    def summary(self):
+        samples = sorted(self.samples)
+        total = sum(samples)
+        return {
+            'calls': len(samples),
+            'records': self.records,
+            'seconds': total,
+            'records_per_second': self.records / total if total else 0.0,
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000,
+        }
+
+
+def run_pipeline(server, workdir, trace=False, fmt='csv'):
+    stages = {name: Stage(name, trace) for name in STAGES}
+    conn = open_store(os.path.join(workdir, f'bench-{int(trace)}.db'))
+    client = BitsoClient(base_url=server.base_url)
+
+    pages = iter_funding_pages(USER, DEFAULT_KEY, DEFAULT_SECRET, client=client)
+    while True:
+        with stages['fetch'].measure():
+            page = next(pages, None)
+        if page is None:
+            break
+        stages['fetch'].records += len(page)
+        with stages['store'].measure(len(page)):
+            upsert_fundings(conn, USER, page)
+
+    period = this_month()
+    totals = GroupedTotals(tuple(GROUPINGS))
+    daily_income = defaultdict(float)
+    deposits = open_funding_writer(os.path.join(workdir, 'bench_deposits.csv'), fmt=fmt, user=USER)
+    failed = open_funding_writer(os.path.join(workdir, 'bench_failed.csv'), create_empty=False, fmt=fmt, user=USER)
+
+    batches = iter_fundings(conn, USER, page_size=READ_BATCH_SIZE)
+    while True:
+        with stages['read'].measure():
+            batch = next(batches, None)
+        if batch is None:
+            break
+        stages['read'].records += len(batch)
+
+        with stages['flatten'].measure(len(batch)):
+            table = flatten_fundings(batch, report_bad=False, user=USER)
+        with stages['filter'].measure(len(table)):
+            in_period = table[period_mask(table['created_local'], period.start_date, period.end_date)]
+        # The export is written for every record, to load the writer as a full-history run would
+        with stages['export'].measure(len(table)):
+            deposits.write_table(table)
+            failed.write_table(failed_view(table))
+        with stages['aggregate'].measure(len(table)):
+            totals.add_table(table)
+        with stages['chart'].measure(len(in_period)):
+            add_daily_income(daily_income, in_period)
+
+    with stages['export'].measure():
+        deposits.close()
+        failed.close()
+    with stages['aggregate'].measure():
+        for grouping in totals.groupings:
+            totals.summary(grouping)
+    with stages['chart'].measure():
+        chart = (daily_income, period.title, os.path.join(workdir, 'bench_income.png'), period.name)
+        render_growth_charts([chart], force=True, cache_path=None)
+
+    client.close()
+    conn.close()
+    return stages, dict(client.stats)
+
+
+def benchmark_size(records, memory=True, fmt='csv', **server_options):
+    server = start_mock_server(records, **server_options)
+    try:
+        with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+            # The pipeline's progress prints would dominate the small sizes
+            with contextlib.redirect_stdout(devnull):
+                stages, http = run_pipeline(server, workdir, fmt=fmt)
+                peaks = {}
+                if memory:
+                    tracemalloc.start()
+                    try:
+                        traced, _ = run_pipeline(server, workdir, trace=True, fmt=fmt)
+                    finally:
+                        tracemalloc.stop()
+                    peaks = {name: stage.peak_bytes for name, stage in traced.items()}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    result = {'records': records, 'http': http, 'server': dict(server.stats), 'stages': {}}
+    for name, stage in stages.items():
+        result['stages'][name] = stage.summary()
+        if memory:
+            result['stages'][name]['peak_mb'] = peaks[name] / 2 ** 20
+    return result
+
+
+def print_result(result):
+    http = result['http']
+    print(f"\n{result['records']:,} records  "
+          f"({http['requests']} requests, {http['retries']} retries, {http['sleep_seconds']:.1f}s backoff)")
+    print(f"{'stage':<10}{'records/s':>14}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+    for name, stage in result['stages'].items():
+        peak = f"{stage['peak_mb']:.1f}" if 'peak_mb' in stage else '-'
+        print(f"{name:<10}{stage['records_per_second']:>14,.0f}{stage['seconds']:>10.3f}"
+              f"{stage['p50_ms']:>10.2f}{stage['p95_ms']:>10.2f}{stage['p99_ms']:>10.2f}{peak:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark of the fetch and report pipeline.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma-separated record counts (default: 1000,100000,1000000)')
+    parser.add_argument('--format', default='csv', choices=('csv', 'parquet', 'feather'))
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean mock server latency in seconds')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0, help='Share of connections dropped')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    # Retry-After of 0 keeps injected 429s from turning the run into a sleep test
+    server_options = {'latency': args.latency, 'rate_429': args.rate_429, 'retry_after': 0,
+                      'disconnect_rate': args.disconnect_rate}
+    results = []
+    for records in (int(size) for size in args.sizes.split(',')):
+        result = benchmark_size(records, memory=not args.no_memory, fmt=args.format, **server_options)
+        print_result(result)
+        results.append(result)
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Quick "is there anything new?" check for cron, without loading pandas or
+matplotlib. Exits 0 when at least one account has new fundings or a status
+change, 1 when nothing changed and 2 when an account could not be checked,
+so a cron line can read:
+
+    python check_new.py -q && python main.py
+"""
+import argparse
+import sys
+
+from core.client import FetchError
+from core.fetch_funding import has_new_fundings
+from core.store import open_store
+import config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Exits 0 when a sync would find new Bitso fundings, 1 otherwise.')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only report through the exit status')
+    args = parser.parse_args(argv)
+
+    conn = open_store()
+    found = []
+    failed = False
+    for user, (api_key, api_secret) in config.API_KEYS.items():
+        if not api_key or not api_secret:
+            continue
+        try:
+            if has_new_fundings(user, api_key, api_secret, conn):
+                found.append(user)
+        except FetchError as e:
+            print(f"Could not check {user}: {e}", file=sys.stderr)
+            failed = True
+
+    if not args.quiet:
+        print(f"New fundings for: {', '.join(found)}" if found else "No new fundings.")
+    if found:
+        return 0
+    return 2 if failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Full-history backfill that survives crashes and rate-limit lockouts. Each
+page goes into the store in one transaction with the backfill checkpoint (the
+fid marker of the oldest funding stored so far), so an interrupted backfill
+resumes at the next page instead of page 1.
+"""
+import time
+from functools import partial
+
+from core import store
+from core.client import FetchError
+from core.fetch_funding import iter_funding_pages
+from core.metrics import metrics
+from core.scheduler import run_accounts
+import config
+
+# When the retries of a request run out (e.g. a rate-limit lockout), wait this many seconds and resume
+# from the checkpoint, up to BACKFILL_RESUMES times per account
+BACKFILL_RESUMES = getattr(config, 'BACKFILL_RESUMES', 3)
+BACKFILL_LOCKOUT_WAIT = getattr(config, 'BACKFILL_LOCKOUT_WAIT', 300)
+
+
+def backfill_user(user, api_key, api_secret, conn, client=None, rate_limiter=None):
+    """
+    Pages the user's whole history into the store, starting after the
+    checkpoint when there is one. Returns the number of fundings stored by
+    this call.
+    """
+    checkpoint = store.get_checkpoint(conn, user)
+    if checkpoint and checkpoint[4]:
+        print(f"Backfill of {user} already complete ({checkpoint[2]} fundings). Use --restart to run it again.")
+        return 0
+
+    marker, pages, records, newest, _ = checkpoint or (None, 0, 0, None, 0)
+    if marker:
+        print(f"Resuming backfill of {user} after page {pages} ({records} fundings stored)")
+
+    stored = 0
+    for fundings in iter_funding_pages(user, api_key, api_secret, client, rate_limiter,
+                                       marker=marker, page_number=pages + 1):
+        pages += 1
+        records += len(fundings)
+        # The newest funding when the backfill started; later ones are left to the regular sync
+        newest = newest or fundings[0].get('created_at') or ''
+        with metrics.span('store', user=user):
+            store.save_backfill_page(conn, user, fundings, pages, records, newest)
+        stored += len(fundings)
+
+    store.complete_backfill(conn, user, newest or '')
+    print(f"Backfill of {user} complete: {records} fundings in {pages} pages")
+    return stored
+
+
+def backfill_account(user, api_key, api_secret, rate_limiter=None, resumes=BACKFILL_RESUMES,
+                     lockout_wait=BACKFILL_LOCKOUT_WAIT):
+    """run_accounts worker: backfill_user on its own store connection, resuming after retryable failures."""
+    print(f"\nBackfilling user: {user}")
+    conn = store.open_store()
+    for attempt in range(resumes + 1):
+        try:
+            return backfill_user(user, api_key, api_secret, conn, rate_limiter=rate_limiter)
+        except FetchError as e:
+            if not e.retryable or attempt == resumes:
+                raise
+            print(f"Backfill of {user} interrupted: {e}. Resuming from the checkpoint in {lockout_wait:g}s.")
+            metrics.count('backfill_resumes', user=user)
+            time.sleep(lockout_wait)
+
+
+def run_backfill(users=None, restart=False, resumes=BACKFILL_RESUMES, lockout_wait=BACKFILL_LOCKOUT_WAIT):
+    """
+    Backfills the given users (default: every account with credentials) side
+    by side. restart=True drops their checkpoints first. Returns the users
+    whose backfill failed; running again resumes them.
+    """
+    metrics.reset()
+    unknown = set(users or ()) - set(config.API_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown users: {', '.join(sorted(unknown))}")
+
+    accounts = {}
+    for user, (api_key, api_secret) in config.API_KEYS.items():
+        if users and user not in users:
+            continue
+        if not api_key or not api_secret:
+            print(f"Missing credentials for {user}. Skipping...")
+            continue
+        accounts[user] = (api_key, api_secret)
+
+    if restart:
+        conn = store.open_store()
+        for user in accounts:
+            store.reset_backfill(conn, user)
+
+    worker = partial(backfill_account, resumes=resumes, lockout_wait=lockout_wait)
+    return [user for user, _, error in run_accounts(accounts, worker) if error]
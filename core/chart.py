@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import config
+
+# Series hashes of the charts last rendered, so unchanged charts are not redrawn
+CHART_CACHE = getattr(config, 'CHART_CACHE', '.bitso_chart_cache.json')
+
+
+def add_daily_income(daily_income: dict, table):
+    import pandas as pd
+
+    # Only successful/completed transactions count as income
+    complete = table[table['Status'] == 'complete']
+    if complete.empty:
+        return
+
+    amounts = pd.to_numeric(complete['Amount'])
+    for day, amount in amounts.groupby(complete['created_local'].dt.date).sum().items():
+        daily_income[day] += amount
+
+
+def series_hash(daily_income: dict, title: str):
+    """Hash of what a chart shows: its title and the income per day, to the centavo."""
+    digest = hashlib.sha256(title.encode('utf-8'))
+    for day, amount in sorted(daily_income.items()):
+        digest.update(f'\n{day}:{amount:.2f}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_cache(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache):
+    temp = f'{path}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(temp, path)
+
+
+def _new_figure():
+    # Figure + Agg canvas directly: no GUI backend, no pyplot state, and
+    # matplotlib is only imported when a chart actually has to be drawn
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(12, 7))
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _draw(figure, daily_income: dict, title: str, filename: str):
+    import pandas as pd
+    from matplotlib.dates import DateFormatter
+
+    # Days without income still get a bar, as resample('D') used to give them
+    daily_income = pd.Series(daily_income).sort_index()
+    daily_income.index = pd.to_datetime(daily_income.index)
+    daily_income = daily_income.reindex(
+        pd.date_range(daily_income.index.min(), daily_income.index.max(), freq='D'), fill_value=0
+    )
+
+    # Create and style the bar chart
+    figure.clear()
+    ax = figure.add_subplot()
+    daily_income.plot(kind='bar', color='skyblue', edgecolor='black', ax=ax)
+
+    # Improve formatting
+    ax.set_title(f'Feria lavada: {title}', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Dia del mes', fontsize=12)
+    ax.set_ylabel('Dinero para la pension', fontsize=12)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    # Format x-axis to show only the day number
+    ax.xaxis.set_major_formatter(DateFormatter('%d'))
+    ax.tick_params(axis='x', labelrotation=0)
+    figure.tight_layout()
+
+    # Save the chart to a file
+    figure.savefig(filename)
+
+
+def render_growth_charts(charts, force=False, cache_path=CHART_CACHE):
+    """
+    Renders several charts in one go, reusing a single figure. `charts` holds
+    (daily_income, title, filename, name) tuples as taken by
+    generate_growth_chart. A chart whose file exists and whose daily series
+    hashes the same as at its last render is skipped unless force is set.
+    Returns the filenames actually written.
+    """
+    cache = _load_cache(cache_path) if cache_path else {}
+    figure = None
+    written = []
+
+    for daily_income, title, filename, name in charts:
+        print(f"\nGenerating daily income bar chart for {name}...")
+
+        if not daily_income:
+            print(f"No income data found for {name}. Bar chart not generated.")
+            continue
+
+        digest = series_hash(daily_income, title)
+        if not force and cache.get(os.path.abspath(filename)) == digest and os.path.exists(filename):
+            print(f"Daily income for {name} unchanged since the last run. {filename} is up to date.")
+            continue
+
+        figure = figure or _new_figure()
+        _draw(figure, daily_income, title, filename)
+        cache[os.path.abspath(filename)] = digest
+        written.append(filename)
+        print(f"Success! Daily income bar chart saved to {filename}")
+
+    if cache_path and written:
+        _save_cache(cache_path, cache)
+    return written
+
+
+def generate_growth_chart(daily_income: dict, title: str, filename: str = 'bitso_this_month_income.png',
+                          name: str = 'this month', force: bool = False):
+    """
+    Generates and saves a bar chart of daily income for one period.
+
+    Args:
+        daily_income (dict): Income per Mexico City day, as built by add_daily_income.
+        title (str): Shown after 'Feria lavada:' at the top of the chart.
+        filename (str): The name of the file to save the chart to.
+        name (str): How the period is referred to in progress messages.
+        force (bool): Redraw even when the daily series is unchanged since the last run.
+    """
+    render_growth_charts([(daily_income, title, filename, name)], force)
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException, ConnectionError, Timeout, ChunkedEncodingError
+from http.client import RemoteDisconnected
+from urllib3.exceptions import ProtocolError
+
+from auth import encode_query, get_signer
+from core.metrics import metrics
+import config
+
+HTTP_POOL_SIZE = getattr(config, 'HTTP_POOL_SIZE', 10)
+
+# Rate limiting and transient server errors are worth retrying, anything else is not
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (ConnectionError, Timeout, ChunkedEncodingError, RemoteDisconnected, ProtocolError)
+
+
+class FetchError(Exception):
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_nonce_error(response):
+    # Bitso answers 401 when a nonce is not above the last one it saw for the key
+    return response.status_code == 401 and 'nonce' in response.text.lower()
+
+
+class BitsoClient:
+    """
+    One pooled keep-alive session shared by every account. Retries use
+    decorrelated jitter and never sleep less than the server's Retry-After.
+    """
+
+    def __init__(self, base_url=None, pool_size=HTTP_POOL_SIZE, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, timeout=10):
+        self.base_url = base_url or config.BASE_URL
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'nonce_retries': 0, 'sleep_seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def get(self, endpoint, params, api_key, api_secret, user=None, rate_limiter=None):
+        # Encoded once and sent as-is, so the signed path is exactly the requested one
+        query = encode_query(params)
+        path = f'{endpoint}?{query}' if query else endpoint
+        url = self.base_url + path
+        signer = get_signer(api_key, api_secret)
+        delay = self.base_delay
+
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter:
+                rate_limiter.acquire()
+
+            retry_after = None
+            # A fresh nonce for every attempt
+            headers = signer.headers('GET', path)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except RETRYABLE_ERRORS as conn_err:
+                error = f"Connection error: {conn_err}"
+            except RequestException as req_err:
+                raise FetchError(f"Request error for user {user}: {req_err}") from req_err
+            else:
+                self._count('requests')
+                if response.status_code == 200:
+                    return response
+                if is_nonce_error(response) and attempt < self.max_retries:
+                    # Another request on this key overtook ours in flight; re-sign at once
+                    self._count('nonce_retries')
+                    metrics.count('nonce_retries', user=user)
+                    continue
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise FetchError(
+                        f"Non-retryable status code {response.status_code} for user {user}: {response.text}"
+                    )
+                if response.status_code == 429:
+                    self._count('rate_limited')
+                    metrics.count('rate_limited', user=user)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                error = f"Non-200 status code: {response.status_code} - {response.text}"
+
+            if attempt == self.max_retries:
+                break
+
+            # Decorrelated jitter: spread retries out without synchronising accounts
+            delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+            sleep_time = max(delay, retry_after or 0)
+            print(f"{error}. Retry {attempt + 1}/{self.max_retries} - sleeping {sleep_time:.1f} seconds...")
+            self._count('retries')
+            self._count('sleep_seconds', sleep_time)
+            metrics.count('retries', user=user)
+            metrics.count('backoff_seconds', sleep_time, user=user)
+            time.sleep(sleep_time)
+
+        raise FetchError(f"Failed to fetch data after {self.max_retries} retries for user {user}", retryable=True)
+
+    def close(self):
+        self.session.close()
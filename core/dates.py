@@ -0,0 +1,42 @@
+from datetime import datetime, time, timedelta, timezone
+import pytz
+
+MEXICO_TZ = pytz.timezone('America/Mexico_City')
+
+# Bitso returns created_at as UTC in this exact layout, so strings in it sort chronologically
+API_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S+00:00"
+
+
+def local_date_window(start_date, end_date):
+    """
+    Returns (since, until) as UTC datetimes covering start_date through
+    end_date inclusive, both as Mexico City calendar days. `until` is exclusive.
+    """
+    since = MEXICO_TZ.localize(datetime.combine(start_date, time.min))
+    until = MEXICO_TZ.localize(datetime.combine(end_date + timedelta(days=1), time.min))
+    return since.astimezone(timezone.utc), until.astimezone(timezone.utc)
+
+
+def to_api_string(dt):
+    return dt.astimezone(timezone.utc).strftime(API_DATE_FORMAT)
+
+
+def parse_local_timestamps(raw, report_bad=True):
+    """
+    Parses a whole column of API timestamps in one pass. Returns a Series of
+    Mexico City timestamps aligned with `raw`, NaT where the value is missing
+    or malformed.
+    """
+    # pandas takes a few hundred ms to import, which the sync and check paths never need
+    import pandas as pd
+
+    raw = pd.Series(raw, dtype=object)
+    parsed = pd.to_datetime(raw, utc=True, errors='coerce', format='ISO8601')
+    if report_bad:
+        for bad in raw[raw.notna() & parsed.isna()]:
+            print(f"Skipping record with bad date format: {bad}")
+    return parsed.dt.tz_convert(MEXICO_TZ)
+
+
+def parse_local_created_at(fundings, report_bad=True):
+    return parse_local_timestamps([f.get('created_at') for f in fundings], report_bad)
@@ -0,0 +1,176 @@
+import os
+from decimal import Decimal, InvalidOperation
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from core.flatten import COLUMNS, CATEGORICAL_COLUMNS
+
+COMPRESSION = 'zstd'
+
+# Amounts keep up to 8 decimals, enough for crypto fundings
+AMOUNT_TYPE = pa.decimal128(28, 8)
+AMOUNT_QUANTUM = Decimal('0.00000001')
+
+CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def _field_type(column):
+    if column == 'Date (UTC)':
+        return pa.timestamp('us', tz='UTC')
+    if column == 'Date (Mexico City)':
+        return pa.timestamp('us', tz='America/Mexico_City')
+    if column == 'Amount':
+        return AMOUNT_TYPE
+    if column in CATEGORICAL_COLUMNS:
+        return CATEGORY_TYPE
+    return pa.string()
+
+
+FUNDING_SCHEMA = pa.schema([pa.field(column, _field_type(column)) for column in COLUMNS])
+
+
+def summary_schema(label):
+    return pa.schema([pa.field(label, pa.string()), pa.field('Amount', AMOUNT_TYPE)])
+
+
+def to_decimal(value):
+    try:
+        return Decimal(str(value)).quantize(AMOUNT_QUANTUM)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _strings(values):
+    return [None if v is None else str(v) for v in values]
+
+
+def to_arrow_table(table):
+    """Converts a flattened fundings table to FUNDING_SCHEMA."""
+    created_local = table['created_local']
+    arrays = []
+    for field in FUNDING_SCHEMA:
+        if field.name == 'Date (UTC)':
+            array = pa.Array.from_pandas(created_local.dt.tz_convert('UTC')).cast(field.type)
+        elif field.name == 'Date (Mexico City)':
+            array = pa.Array.from_pandas(created_local).cast(field.type)
+        elif field.name == 'Amount':
+            array = pa.array([to_decimal(v) for v in table['Amount']], type=AMOUNT_TYPE)
+        elif field.type == CATEGORY_TYPE:
+            column = table[field.name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # The category codes become the dictionary indices as they are
+                array = pa.Array.from_pandas(column).cast(CATEGORY_TYPE)
+            else:
+                array = pa.array(_strings(column), type=pa.string()).dictionary_encode()
+        else:
+            array = pa.array(_strings(table[field.name]), type=pa.string())
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=FUNDING_SCHEMA)
+
+
+def to_ipc_buffer(table):
+    """
+    Serialises a flattened fundings table, created_local and user included, as
+    an Arrow IPC stream; how report worker processes hand tables back.
+    """
+    columns = [column for column in COLUMNS + ['created_local', 'user'] if column in table]
+    arrow_table = pa.Table.from_pandas(table[columns], preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue()
+
+
+def from_ipc_buffer(buffer):
+    table = pa.ipc.open_stream(buffer).read_all().to_pandas()
+    # Arrow has no object dtype; give string columns back their None for missing values
+    for column in table.columns:
+        if table[column].dtype == object:
+            table[column] = table[column].astype(object).where(table[column].notna(), None)
+    return table
+
+
+class FundingArrowWriter:
+    """
+    Same interface as FundingCsvWriter, but writes a compressed Parquet or
+    Feather dataset partitioned as <root>/user=<user>/month=<YYYY-MM>/, where
+    root is the CSV filename without its extension. Parquet partitions stay
+    open until close(), so batches are appended rather than rewritten. Arrow
+    IPC files allow one dictionary per column, so Feather partitions are
+    collected as Arrow tables and written on close().
+    """
+
+    def __init__(self, filename, label='Deposit summary', create_empty=True, fmt='parquet', user=None):
+        self.root = os.path.splitext(filename)[0]
+        self.filename = self.root
+        self.label = label
+        self.fmt = fmt
+        self.user = user
+        self.rows = 0
+        self._writers = {}
+        self._pending = {}
+        self._created = create_empty
+        if create_empty:
+            os.makedirs(self.root, exist_ok=True)
+
+    def _partition_path(self, user, month):
+        directory = os.path.join(self.root, f'user={user}', f'month={month}')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'part-0.{self.fmt}')
+
+    def _write_partition(self, user, month, arrow_table):
+        key = (user, month)
+        if self.fmt == 'feather':
+            self._pending.setdefault(key, []).append(arrow_table)
+            return
+        if key not in self._writers:
+            path = self._partition_path(user, month)
+            self._writers[key] = pq.ParquetWriter(path, FUNDING_SCHEMA, compression=COMPRESSION)
+        self._writers[key].write_table(arrow_table)
+
+    def write_table(self, table):
+        if table.empty:
+            return
+
+        default_user = self.user or 'unknown'
+        if 'user' in table:
+            users = table['user'].fillna(default_user)
+        else:
+            users = pd.Series(default_user, index=table.index)
+        months = table['created_local'].dt.strftime('%Y-%m').fillna('unknown')
+
+        for (user, month), part in table.groupby([users, months], sort=False):
+            self._write_partition(user, month, to_arrow_table(part))
+        self.rows += len(table)
+
+    def close(self):
+        if not (self._writers or self._pending or self._created):
+            return False
+        for writer in self._writers.values():
+            writer.close()
+        for (user, month), tables in self._pending.items():
+            # combine_chunks merges each batch's dictionary into one
+            table = pa.concat_tables(tables).combine_chunks()
+            feather.write_feather(table, self._partition_path(user, month), compression=COMPRESSION)
+        self._writers = {}
+        self._pending = {}
+        print(f"{self.label} saved to {self.root}/ ({self.fmt})")
+        return True
+
+
+def write_summary(summary, total_amount, filename, fmt='parquet', label='Sender Name'):
+    names = [name for name, _ in summary] + ['Total']
+    amounts = [to_decimal(amount) for _, amount in summary] + [to_decimal(total_amount)]
+    table = pa.Table.from_arrays(
+        [pa.array(_strings(names), type=pa.string()), pa.array(amounts, type=AMOUNT_TYPE)],
+        schema=summary_schema(label)
+    )
+
+    path = f'{os.path.splitext(filename)[0]}.{fmt}'
+    if fmt == 'parquet':
+        pq.write_table(table, path, compression=COMPRESSION)
+    else:
+        feather.write_feather(table, path, compression=COMPRESSION)
+    return path
@@ -1,64 +1,61 @@
-import time
-import requests
-from requests.exceptions import RequestException, ConnectionError
-from http.client import RemoteDisconnected
-from urllib3.exceptions import ProtocolError
+import threading
+from datetime import datetime, timedelta, timezone
 
-from auth import generate_auth_headers_for_user
+from core import jsonfast, store
+from core.client import BitsoClient
+from core.dates import to_api_string
+from core.metrics import metrics, progress
 import config
 
+# How far back to keep re-reading pages so pending deposits pick up their final status
+RECHECK_DAYS = getattr(config, 'RECHECK_DAYS', 3)
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = BitsoClient()
+        return _default_client
+
+
 def save_raw_response(data, filename='bitso_raw_fundings.json'):
     # with open(filename, 'w') as f:
     #     json.dump(data, f, indent=4)
     # print(f"Raw API response saved to {filename}")
     pass
 
-def fetch_funding_transactions_for_user(user, api_key, api_secret, max_retries=5, backoff_factor=1.5):
+def iter_funding_pages(user, api_key, api_secret, client=None, rate_limiter=None, since=None, until=None,
+                       marker=None, page_number=1):
+    """
+    Yields pages of fundings newest-first. With since/until (aware datetimes,
+    until exclusive) only records inside the window are yielded, and paging
+    stops at the first page that reaches back past `since`. A `marker` (fid)
+    starts with the page after that funding, e.g. to resume a backfill;
+    page_number only numbers the progress lines.
+    """
     endpoint = '/v3/fundings'
-    url = config.BASE_URL + endpoint
-
-    all_fundings = []
-    marker = None
-    page_number = 1
+    client = client or get_default_client()
+    since_str = to_api_string(since) if since else None
+    until_str = to_api_string(until) if until else None
 
     while True:
         params = {'limit': 100}
         if marker:
             params['marker'] = marker
-            print(f"Fetching page {page_number} for {user} with marker (fid): {marker}")
-        else:
-            print(f"Fetching page {page_number} for {user}")
-
-        retries = 0
-        while retries < max_retries:
-            try:
-                headers = generate_auth_headers_for_user(
-                    endpoint, method='GET', query_params=params,
-                    api_key=api_key, api_secret=api_secret
-                )
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-
-                if response.status_code == 200:
-                    break  # Success
-                else:
-                    print(f"Non-200 status code: {response.status_code} - {response.text}")
-                    raise RequestException(f"Non-200 response: {response.status_code}")
-
-            except (ConnectionError, RemoteDisconnected, ProtocolError) as conn_err:
-                print(f"Connection error: {conn_err}. Retrying...")
-
-            except RequestException as req_err:
-                print(f"Request error: {req_err}. Retrying...")
-
-            retries += 1
-            sleep_time = backoff_factor ** retries
-            print(f"Retry {retries}/{max_retries} - sleeping {sleep_time:.1f} seconds...")
-            time.sleep(sleep_time)
+            progress(f"Fetching page {page_number} for {user} with marker (fid): {marker}")
         else:
-            raise Exception(f"Failed to fetch data after {max_retries} retries for user {user}")
-
-        result = response.json()
-        fundings = result.get('payload', [])
+            progress(f"Fetching page {page_number} for {user}")
+
+        with metrics.span('fetch', user=user):
+            response = client.get(endpoint, params, api_key, api_secret, user=user, rate_limiter=rate_limiter)
+            fundings = jsonfast.decode_page(response.content)
+        metrics.count('pages', user=user)
+        metrics.count('bytes', len(response.content), user=user)
+        metrics.count('records', len(fundings), user=user)
         if not fundings:
             print(f"No more fundings found for {user}. Breaking out of loop.")
             break
@@ -68,7 +65,21 @@ def fetch_funding_transactions_for_user(user, api_key, api_secret, max_retries=5
         #     json.dump(result, f, indent=4)
         # print(f"Page {page_number} response for {user} saved to {raw_page_filename}")
 
-        all_fundings.extend(fundings)
+        if since_str or until_str:
+            in_window = [
+                f for f in fundings
+                if (not since_str or (f.get('created_at') or '') >= since_str)
+                and (not until_str or (f.get('created_at') or '') < until_str)
+            ]
+            if in_window:
+                yield in_window
+        else:
+            yield fundings
+
+        oldest = fundings[-1].get('created_at')
+        if since_str and oldest and oldest < since_str:
+            print(f"Reached the start of the report window for {user}. Stopping.")
+            break
 
         if len(fundings) < 100:
             print(f"Final page reached for {user} (fewer than 100 results).")
@@ -77,5 +88,92 @@ def fetch_funding_transactions_for_user(user, api_key, api_secret, max_retries=5
         marker = fundings[-1]['fid']
         page_number += 1
 
+
+def fetch_funding_transactions_for_user(user, api_key, api_secret, client=None, rate_limiter=None,
+                                        since=None, until=None):
+    all_fundings = []
+    for fundings in iter_funding_pages(user, api_key, api_secret, client, rate_limiter, since, until):
+        all_fundings.extend(fundings)
+
     # save_raw_response(all_fundings, filename=f'bitso_raw_fundings_{user}.json')
     return all_fundings
+
+
+def has_new_fundings(user, api_key, api_secret, conn, client=None, rate_limiter=None,
+                     recheck_days=RECHECK_DAYS):
+    """
+    Cheap test of whether a sync would bring anything in: the newest fundings
+    are compared with the store, and only a fid it does not hold or a status
+    that has changed counts. Without a pending record inside the recheck
+    window that is a single one-record request; with one, pages are read
+    newest-first down to the oldest such record.
+    """
+    client = client or get_default_client()
+    cutoff = to_api_string(datetime.now(timezone.utc) - timedelta(days=recheck_days))
+    recheck_from = store.oldest_mutable_created_at(conn, user, cutoff)
+
+    params = {'limit': 1 if recheck_from is None else 100}
+    while True:
+        with metrics.span('fetch', user=user):
+            response = client.get('/v3/fundings', params, api_key, api_secret, user=user,
+                                  rate_limiter=rate_limiter)
+            fundings = jsonfast.decode_page(response.content)
+        metrics.count('pages', user=user)
+        if not fundings:
+            return False
+
+        stored = store.stored_statuses(conn, user, [f['fid'] for f in fundings])
+        if any(f['fid'] not in stored or f.get('status') != stored[f['fid']] for f in fundings):
+            return True
+
+        oldest = fundings[-1].get('created_at') or ''
+        if recheck_from is None or oldest <= recheck_from or len(fundings) < params['limit']:
+            return False
+        params['marker'] = fundings[-1]['fid']
+
+
+def sync_fundings_for_user(user, api_key, api_secret, conn, since=None, recheck_days=RECHECK_DAYS,
+                           client=None, rate_limiter=None):
+    """
+    Pages newest-first into the local store and stops as soon as the pages
+    overlap the range a previous sync already covered, provided that range
+    reaches back to `since` (or all the way, when since is None). Otherwise it
+    stops once it has paged past `since`. Pages keep coming while they still
+    cover a pending record created within the last `recheck_days`, so its
+    status gets refreshed.
+    """
+    since_str = to_api_string(since) if since else ''
+    covered_from, covered_to = store.get_coverage(conn, user)
+    covers_window = covered_from is not None and covered_from <= since_str
+    cutoff = to_api_string(datetime.now(timezone.utc) - timedelta(days=recheck_days))
+    recheck_from = store.oldest_mutable_created_at(conn, user, cutoff)
+
+    newest = None
+    fetched = 0
+    for fundings in iter_funding_pages(user, api_key, api_secret, client, rate_limiter):
+        with metrics.span('store', user=user):
+            store.upsert_fundings(conn, user, fundings)
+        fetched += len(fundings)
+        newest = newest or fundings[0].get('created_at') or ''
+
+        oldest = fundings[-1].get('created_at') or ''
+        overlaps = covered_to is not None and oldest < covered_to
+        rechecked = recheck_from is None or oldest < recheck_from
+        if not rechecked:
+            continue
+
+        if overlaps and covers_window:
+            print(f"Reached already stored fundings for {user}. Stopping sync.")
+            store.set_coverage(conn, user, covered_from, max(newest, covered_to))
+            break
+        if since_str and oldest < since_str:
+            print(f"Synced back past the start of the report window for {user}. Stopping sync.")
+            new_from = min(oldest, covered_from) if overlaps else oldest
+            store.set_coverage(conn, user, new_from, max(newest, covered_to) if overlaps else newest)
+            break
+    else:
+        # Walked to the very first funding
+        store.set_coverage(conn, user, '', max(newest or '', covered_to or ''))
+
+    print(f"Synced {fetched} funding transactions for {user}")
+    return fetched
@@ -1,29 +1,35 @@
-import pytz
 from datetime import datetime, date
-import pandas as pd
-from dateutil import parser
 
-def filter_fundings_this_month(fundings):
-    mexico_tz = pytz.timezone('America/Mexico_City')
-    today_local = datetime.now(mexico_tz).date()
+from core.dates import MEXICO_TZ, local_date_window, parse_local_created_at
 
-    start_date = date(today_local.year, today_local.month, 1)
-    end_date = today_local
 
-    print(f"Filtering fundings from {start_date} to {end_date} (Mexico City time)")
+def this_month_range():
+    today_local = datetime.now(MEXICO_TZ).date()
+    return date(today_local.year, today_local.month, 1), today_local
+
+
+def period_mask(created_local, start_date, end_date):
+    # True where the Mexico City timestamp falls on start_date..end_date; NaT never does
+    since, until = local_date_window(start_date, end_date)
+    return (created_local >= since) & (created_local < until)
+
+
+def select_fundings_between(fundings, start_date, end_date):
+    # Quiet version of the filters below, for callers feeding fundings batch by batch
+    fundings = list(fundings)
+    if not fundings:
+        return []
 
-    filtered = []
-    for f in fundings:
-        created_str = f.get('created_at')
-        if not created_str:
-            continue
+    mask = period_mask(parse_local_created_at(fundings), start_date, end_date).to_numpy()
+    return [f for f, keep in zip(fundings, mask) if keep]
+
+
+def filter_fundings_this_month(fundings):
+    start_date, end_date = this_month_range()
+
+    print(f"Filtering fundings from {start_date} to {end_date} (Mexico City time)")
 
-        try:
-            created_local = parser.isoparse(created_str).astimezone(mexico_tz).date()
-            if start_date <= created_local <= end_date:
-                filtered.append(f)
-        except Exception as e:
-            print(f"Skipping record with bad date format: {created_str} ({e})")
+    filtered = select_fundings_between(fundings, start_date, end_date)
 
     print(f"Filtered down to {len(filtered)} funding transactions")
-    return filtered
\ No newline at end of file
+    return filtered
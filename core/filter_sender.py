@@ -1,50 +1,140 @@
+import csv
+from decimal import Decimal, InvalidOperation
 import pandas as pd
 import config
 
-def filter_sender_name(fundings, filename='bitso_sum_by_sender_name.csv'):
-    data = []
-    for f in fundings:
-        # Exclude fundings with a status of 'failed'
-        if f.get('status') == 'failed':
-            continue
+from core.export import OUTPUT_FORMAT
+from core.flatten import flatten_fundings
+from core.senders import resolve_sender_totals
+
+# Summaries written by the report runs; any keys of GROUPINGS below
+SUMMARY_GROUPINGS = getattr(config, 'SUMMARY_GROUPINGS', ('sender',))
+
+# Amounts are summed as integer units of 10^-8, so totals are exact to the centavo
+AMOUNT_DECIMALS = 8
+
+
+def sender_keys(table):
+    # The raw (CLABE, name, RFC/CURP) of each sender; resolve_sender_totals folds them into payers.
+    # Rows with all three blank have no sender and are left out, as groupby leaves out None keys
+    senders = zip(table['Sender CLABE'], table['Sender Name'], table['Sender RFC/CURP'])
+    return pd.Series([sender if any(value and value.strip() for value in sender) else None for sender in senders],
+                     index=table.index, dtype=object)
+
+
+# Summary name -> (label column, plural noun, function building the group key from a flattened table,
+# function turning the totals by key into the totals shown, or None to show them as they are)
+GROUPINGS = {
+    'sender': ('Sender Name', 'senders', sender_keys, resolve_sender_totals),
+    'receive_clabe': ('Receive CLABE', 'receiving accounts', lambda table: table['Receive CLABE'], None),
+    'user': ('User', 'users', lambda table: table['user'], None),
+    'day': ('Day', 'days', lambda table: table['created_local'].dt.date, None),
+    'method': ('Method', 'methods', lambda table: table['Method'], None),
+}
+
+
+def summary_filename(grouping, suffix=''):
+    name = 'sender_name' if grouping == 'sender' else grouping
+    return f'bitso_sum_by_{name}{suffix}.csv'
+
 
-        details = f.get('details', {}) or {}
-        clabe = details.get('sender_clabe')
-        amount_str = f.get('amount', 0)
+def to_units(amount):
+    try:
+        value = Decimal(str(amount))
+    except (InvalidOperation, ValueError):
+        return None
+    if not value.is_finite():
+        return None
+    return int(value.scaleb(AMOUNT_DECIMALS).to_integral_value())
 
-        try:
-            amount = float(amount_str)
-        except ValueError:
+
+def from_units(units):
+    return Decimal(units).scaleb(-AMOUNT_DECIMALS)
+
+
+class GroupedTotals:
+    """
+    Running exact totals of non-failed deposits, kept for several groupings at
+    once. Each batch is scanned once and summed into every requested grouping.
+    """
+
+    def __init__(self, groupings=('sender',)):
+        unknown = set(groupings) - set(GROUPINGS)
+        if unknown:
+            raise ValueError(f"Unknown summary groupings: {', '.join(sorted(unknown))}")
+        self.groupings = tuple(groupings)
+        self.totals = {grouping: {} for grouping in self.groupings}
+
+    def add_table(self, table, sign=1):
+        """Adds the batch to every grouping; sign=-1 takes a previously added batch back out."""
+        # Exclude fundings with a status of 'failed'
+        table = table[table['Status'] != 'failed']
+
+        units = table['Amount'].map(to_units)
+        valid = units.notna()
+        for amount_str in table['Amount'][~valid]:
             print(f"Invalid amount: {amount_str}. Skipping.")
-            continue
+        table = table[valid]
+        # Python ints (object dtype) so the group sums can never overflow
+        units = units[valid].astype(object)
+
+        for grouping in self.groupings:
+            keys = GROUPINGS[grouping][2](table)
+            totals = self.totals[grouping]
+            # groupby drops rows whose key resolves to nothing; observed=True leaves out
+            # categories with no rows in this batch
+            for key, amount in units.groupby(keys, observed=True).sum().items():
+                totals[key] = totals.get(key, 0) + sign * int(amount)
+                if sign < 0 and not totals[key]:
+                    del totals[key]
+
+    def merge(self, totals):
+        """Adds the `totals` of another GroupedTotals with the same groupings, e.g. from a worker process."""
+        for grouping in self.groupings:
+            merged = self.totals[grouping]
+            for key, units in totals[grouping].items():
+                merged[key] = merged.get(key, 0) + units
+
+    def add_many(self, fundings, user=None):
+        self.add_table(flatten_fundings(fundings, report_bad=False, user=user))
 
-        name = config.ACCOUNT.get(clabe, clabe)
-        data.append({
-            'Sender Name': name,
-            'Amount': amount
-        })
+    def summary(self, grouping='sender'):
+        # Sorted by key, amounts as exact Decimals
+        totals = self.totals[grouping]
+        resolve = GROUPINGS[grouping][3]
+        if resolve is not None:
+            totals = resolve(totals)
+        return [(key, from_units(units)) for key, units in sorted(totals.items())]
 
-    df = pd.DataFrame(data)
-    df = df.dropna(subset=['Sender Name'])
+    def write(self, filename='bitso_sum_by_sender_name.csv', grouping='sender', fmt=None):
+        label, noun, _, _ = GROUPINGS[grouping]
+        summary = self.summary(grouping)
 
-    summary = (
-        df.groupby('Sender Name', as_index=False)
-        .sum(numeric_only=True)
-    )
+        # Compute total
+        total_amount = from_units(sum(self.totals[grouping].values()))
 
-    # Sort alphabetically
-    summary = summary.sort_values(by='Sender Name')
+        fmt = fmt or OUTPUT_FORMAT
+        if fmt != 'csv':
+            from core.export_arrow import write_summary
+            filename = write_summary(summary, total_amount, filename, fmt, label)
+        else:
+            with open(filename, 'w', newline='', encoding='utf-8') as out:
+                writer = csv.writer(out, lineterminator='\n')
+                writer.writerow([label, 'Amount'])
+                for key, amount in summary:
+                    writer.writerow([key, f"${amount:,.2f}"])
+                # Append total at the end
+                writer.writerow(['Total', f"${total_amount:,.2f}"])
 
-    # Compute total
-    total_amount = summary['Amount'].sum()
-    total_row = pd.DataFrame([{'Sender Name': 'Total', 'Amount': total_amount}])
+        print(f"Sum of deposits by {label} saved to {filename}")
+        print(f"Total amount from all {noun}: ${total_amount:,.2f}")
 
-    # Append total at the end
-    summary = pd.concat([summary, total_row], ignore_index=True)
+    def write_all(self, suffix='', fmt=None):
+        for grouping in self.groupings:
+            self.write(summary_filename(grouping, suffix), grouping, fmt)
 
-    # Format Amounts
-    summary['Amount'] = summary['Amount'].apply(lambda x: f"${x:,.2f}")
 
-    summary.to_csv(filename, index=False)
-    print(f"Sum of deposits by Sender Name saved to {filename}")
-    print(f"Total amount from all senders: ${total_amount:,.2f}")
\ No newline at end of file
+def filter_sender_name(fundings, filename='bitso_sum_by_sender_name.csv', fmt=None):
+    totals = GroupedTotals(('sender',))
+    totals.add_many(fundings)
+    totals.write(filename, fmt=fmt)
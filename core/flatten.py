@@ -0,0 +1,91 @@
+import sys
+
+from core.dates import parse_local_timestamps
+
+# Export column -> where it lives in the funding payload
+FIELD_MAP = {
+    'Funding ID': (None, 'fid'),
+    'Status': (None, 'status'),
+    'Date (UTC)': (None, 'created_at'),
+    'Amount': (None, 'amount'),
+    'Currency': (None, 'currency'),
+    'Asset': (None, 'asset'),
+    'Method': (None, 'method'),
+    'Method Name': (None, 'method_name'),
+    'Network': (None, 'network'),
+    'Protocol': (None, 'protocol'),
+    'Integration': (None, 'integration'),
+    'Sender Name': ('details', 'sender_name'),
+    'Sender Ref': ('details', 'sender_ref'),
+    'Sender CLABE': ('details', 'sender_clabe'),
+    'Receive CLABE': ('details', 'receive_clabe'),
+    'Sender Bank': ('details', 'sender_bank'),
+    'CLAVE': ('details', 'clave'),
+    'CLAVE Rastreo': ('details', 'clave_rastreo'),
+    'Numeric Reference': ('details', 'numeric_reference'),
+    'Concept': ('details', 'concepto'),
+    'CEP Link': ('details', 'cep_link'),
+    'Sender RFC/CURP': ('details', 'sender_rfc_curp'),
+    'Deposit Type': ('details', 'deposit_type'),
+    'Notes': ('details', 'notes'),
+    'Emoji': ('details', 'emoji'),
+    'Legal Entity Name': ('legal_operation_entity', 'name'),
+    'Legal Country': ('legal_operation_entity', 'country_code_iso_2'),
+    'Legal Image ID': ('legal_operation_entity', 'image_id'),
+}
+
+# Column order of every funding export
+COLUMNS = list(FIELD_MAP)
+COLUMNS.insert(COLUMNS.index('Date (UTC)') + 1, 'Date (Mexico City)')
+
+# A handful of distinct values each: stored as pandas categoricals, i.e. small integer codes
+CATEGORICAL_COLUMNS = {
+    'Status', 'Currency', 'Asset', 'Method', 'Method Name', 'Network', 'Protocol', 'Integration',
+    'Sender Bank', 'Deposit Type', 'Legal Entity Name', 'Legal Country'
+}
+# Repeated across many deposits (one sender, one concept): interned, so each distinct value is held once
+INTERNED_COLUMNS = {'Sender Name', 'Sender CLABE', 'Receive CLABE', 'Sender RFC/CURP', 'Concept', 'Legal Image ID'}
+
+
+def _interned(values):
+    return [sys.intern(v) if type(v) is str else v for v in values]
+
+
+def flatten_fundings(fundings, report_bad=True, user=None):
+    """
+    Flattens a batch of raw fundings into one table, once, so every export and
+    aggregation can work off views of it. Besides the export COLUMNS the table
+    carries 'created_local', the Mexico City timestamp (NaT when the date is
+    missing or malformed), and 'user' when one is given.
+
+    The table is the compact form of the batch: only the reported fields,
+    CATEGORICAL_COLUMNS as category codes and INTERNED_COLUMNS interned, so the
+    raw dicts can be dropped as soon as it is built.
+    """
+    # Imported here so that COLUMNS and the exports' FORMATS come without pandas
+    import pandas as pd
+
+    fundings = list(fundings)
+    nested = {
+        'details': [f.get('details') or {} for f in fundings],
+        'legal_operation_entity': [f.get('legal_operation_entity') or {} for f in fundings],
+    }
+
+    data = {}
+    for column, (parent, key) in FIELD_MAP.items():
+        source = fundings if parent is None else nested[parent]
+        data[column] = [item.get(key) for item in source]
+        if column in INTERNED_COLUMNS:
+            data[column] = _interned(data[column])
+
+    table = pd.DataFrame(data, dtype=object)
+    for column in CATEGORICAL_COLUMNS:
+        table[column] = table[column].astype('category')
+    table['created_local'] = parse_local_timestamps(table['Date (UTC)'], report_bad)
+
+    # astype(str) renders "%Y-%m-%d %H:%M:%S" far faster than dt.strftime; '' in case of format issue
+    local_str = table['created_local'].dt.tz_localize(None).dt.floor('s').astype(str)
+    table['Date (Mexico City)'] = local_str.where(table['created_local'].notna(), '')
+    if user is not None:
+        table['user'] = user
+    return table
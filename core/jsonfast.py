@@ -0,0 +1,69 @@
+"""
+JSON encoding for API pages and the store, through orjson or msgspec when
+installed and the stdlib otherwise. Set config.JSON_BACKEND to 'orjson',
+'msgspec' or 'json' to pick one; unset, the first installed of those wins.
+
+Every backend decodes generically into plain dicts, so the store and the
+reports see every field Bitso sends. That generic decode is the fast path:
+a typed msgspec schema only pays off when the typed objects are read as they
+are, and converting them back into the dicts the reports use undoes it.
+"""
+import json
+
+import config
+
+JSON_BACKEND = getattr(config, 'JSON_BACKEND', None)
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+
+def _stdlib_codec():
+    return 'json', json.loads, json.dumps
+
+
+def _orjson_codec():
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+
+    return 'orjson', orjson.loads, dumps
+
+
+def _msgspec_codec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+
+    def dumps(obj):
+        return encoder.encode(obj).decode('utf-8')
+
+    return 'msgspec', msgspec.json.decode, dumps
+
+
+_FACTORIES = {'orjson': _orjson_codec, 'msgspec': _msgspec_codec, 'json': _stdlib_codec}
+
+
+def _select(name=None):
+    if name:
+        if name not in _FACTORIES:
+            raise ValueError(f"Unknown JSON backend: {name}. Expected one of {', '.join(BACKENDS)}")
+        return _FACTORIES[name]()
+    for candidate in BACKENDS:
+        try:
+            return _FACTORIES[candidate]()
+        except ImportError:
+            continue
+
+
+def use_backend(name=None):
+    """Switches the module-level codec; None picks the first installed backend."""
+    global backend, loads, dumps
+    backend, loads, dumps = _select(name)
+
+
+use_backend(JSON_BACKEND)
+
+
+def decode_page(content):
+    """The `payload` list of a /v3/fundings response body (bytes), every field kept."""
+    return loads(content).get('payload', [])
@@ -0,0 +1,165 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import config
+
+# Per-page progress lines ("Fetching page N ..."); switch off for large or scheduled runs
+VERBOSE = getattr(config, 'VERBOSE', True)
+
+# Where run_report writes its run summary; a Prometheus textfile is only written when a path is set
+METRICS_JSON = getattr(config, 'METRICS_JSON', 'bitso_run_metrics.json')
+METRICS_PROMETHEUS = getattr(config, 'METRICS_PROMETHEUS', None)
+
+PROMETHEUS_PREFIX = 'bitso_report'
+
+
+def set_verbose(verbose):
+    global VERBOSE
+    VERBOSE = verbose
+
+
+def is_verbose():
+    return VERBOSE
+
+
+def progress(message):
+    if VERBOSE:
+        print(message)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Metrics:
+    """
+    Stage timings and counters of one run, safe to update from the account
+    threads. Both are keyed by name plus optional labels such as user=.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.perf_counter()
+            self.spans = {}
+            self.counters = {}
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            calls, total = self.spans.get(key, (0, 0.0))
+            self.spans[key] = (calls + 1, total + seconds)
+
+    def count(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def state(self):
+        """Raw spans and counters, picklable, for merge() in another process."""
+        with self._lock:
+            return dict(self.spans), dict(self.counters)
+
+    def merge(self, state):
+        spans, counters = state
+        with self._lock:
+            for key, (calls, seconds) in spans.items():
+                total_calls, total_seconds = self.spans.get(key, (0, 0.0))
+                self.spans[key] = (total_calls + calls, total_seconds + seconds)
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        with self._lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+            duration = time.perf_counter() - self._started
+
+        stages = {}
+        for (name, labels), (calls, seconds) in spans:
+            stage = stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'by_label': []})
+            stage['calls'] += calls
+            stage['seconds'] += seconds
+            if labels:
+                stage['by_label'].append({**dict(labels), 'calls': calls, 'seconds': seconds})
+
+        totals = {}
+        for (name, labels), value in counters:
+            counter = totals.setdefault(name, {'total': 0, 'by_label': []})
+            counter['total'] += value
+            if labels:
+                counter['by_label'].append({**dict(labels), 'value': value})
+
+        return {
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': duration,
+            'stages': stages,
+            'counters': totals,
+        }
+
+    def write_json(self, filename=METRICS_JSON):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+        print(f"Run metrics saved to {filename}")
+
+    def write_prometheus(self, filename):
+        """
+        Writes the textfile collector format of node_exporter. The file is
+        replaced atomically so a scrape never sees half of it.
+        """
+        with self._lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+            duration = time.perf_counter() - self._started
+
+        def labels_text(labels):
+            if not labels:
+                return ''
+            escaped = (k + '="' + v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                       for k, v in labels)
+            return '{' + ','.join(escaped) + '}'
+
+        lines = [
+            f'# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter',
+            *(f'{PROMETHEUS_PREFIX}_stage_seconds_total{labels_text((("stage", name),) + labels)} {seconds:.6f}'
+              for (name, labels), (_, seconds) in spans),
+            f'# TYPE {PROMETHEUS_PREFIX}_stage_calls_total counter',
+            *(f'{PROMETHEUS_PREFIX}_stage_calls_total{labels_text((("stage", name),) + labels)} {calls}'
+              for (name, labels), (calls, _) in spans),
+        ]
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{name}_total counter')
+            lines.extend(f'{PROMETHEUS_PREFIX}_{name}_total{labels_text(labels)} {value:g}'
+                         for (counter, labels), value in counters if counter == name)
+        lines += [
+            f'# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge',
+            f'{PROMETHEUS_PREFIX}_run_duration_seconds {duration:.6f}',
+            f'# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge',
+            f'{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {self.started_at.timestamp():.0f}',
+        ]
+
+        temp = f'{filename}.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp, filename)
+        print(f"Prometheus metrics saved to {filename}")
+
+
+# Shared by every module of a run; run_report resets it at the start
+metrics = Metrics()
@@ -0,0 +1,135 @@
+"""
+Daily partitions of a user's stored fundings: the flattened table of one
+Mexico City day with its totals and daily income, cached on disk under
+PARTITION_DIR. Each partition carries a signature of the day's fids and
+statuses, so a new deposit or a status change rebuilds that day alone and
+every other day is loaded as it was left.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from core.store import iter_fundings, iter_statuses, READ_BATCH_SIZE
+from core.dates import local_date_window, to_api_string
+from core.filter_data import period_mask
+from core.filter_sender import GroupedTotals, SUMMARY_GROUPINGS
+from core.flatten import flatten_fundings
+from core.chart import add_daily_income
+from core.metrics import metrics
+import config
+
+# One directory per user, one file per day; None keeps partitions in memory only
+PARTITION_DIR = getattr(config, 'PARTITION_DIR', '.bitso_partitions')
+
+# Bump when what a partition holds changes, so files from before are rebuilt
+PARTITION_VERSION = 1
+
+
+def day_signatures(conn, user, start_date, end_date):
+    """
+    {day: signature} for the days of start_date..end_date the user has stored
+    fundings on. Only the fid and status columns are read.
+    """
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    starts = [to_api_string(local_date_window(day, day)[0]) for day in days]
+    until = to_api_string(local_date_window(end_date, end_date)[1])
+
+    digests = {}
+    for created_at, fid, status in iter_statuses(conn, user, starts[0], until):
+        day = days[bisect_right(starts, created_at) - 1]
+        digests.setdefault(day, hashlib.sha256()).update(f'{fid}\t{status}\n'.encode('utf-8'))
+    return {day: digest.hexdigest() for day, digest in digests.items()}
+
+
+class DayPartition:
+    """One user's fundings of one day, flattened, with the aggregates the reports merge."""
+
+    def __init__(self, user, day, signature, table):
+        self.user = user
+        self.day = day
+        self.key = (PARTITION_VERSION, tuple(SUMMARY_GROUPINGS), signature)
+        self.table = table
+
+        with metrics.span('aggregate', user=user):
+            totals = GroupedTotals(SUMMARY_GROUPINGS)
+            totals.add_table(table)
+            daily_income = defaultdict(float)
+            add_daily_income(daily_income, table)
+        self.totals = totals.totals
+        self.daily_income = dict(daily_income)
+
+    @property
+    def path(self):
+        return partition_path(self.user, self.day)
+
+
+def partition_path(user, day):
+    return os.path.join(PARTITION_DIR, user, f'{day}.pickle')
+
+
+def build_partition(conn, user, day, signature):
+    """Reads, flattens and aggregates the day from the store."""
+    since, until = local_date_window(day, day)
+    with metrics.span('read', user=user):
+        pages = iter_fundings(conn, user, to_api_string(since), to_api_string(until), READ_BATCH_SIZE)
+        fundings = [f for page in pages for f in page]
+    with metrics.span('flatten', user=user):
+        table = flatten_fundings(fundings, user=user)
+    with metrics.span('filter', user=user):
+        # Records whose date does not parse are left out, as period_mask leaves them out of every period
+        table = table[period_mask(table['created_local'], day, day)]
+    return DayPartition(user, day, signature, table)
+
+
+def load_partition(user, day, signature):
+    """The cached partition of the day, or None when there is none or the day has changed since."""
+    if not PARTITION_DIR:
+        return None
+    # Only a cache: whatever fails to load (another pandas version, a stray or damaged file) is rebuilt
+    try:
+        with open(partition_path(user, day), 'rb') as f:
+            partition = pickle.load(f)
+        if not isinstance(partition, DayPartition):
+            return None
+        if partition.key != (PARTITION_VERSION, tuple(SUMMARY_GROUPINGS), signature):
+            return None
+    except Exception:
+        return None
+    return partition
+
+
+def save_partition(partition):
+    # Temp file then rename, so a crash or a second process writing the same day never leaves half a file
+    if not PARTITION_DIR:
+        return
+    directory = os.path.dirname(partition.path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            pickle.dump(partition, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, partition.path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def iter_day_partitions(conn, user, start_date, end_date):
+    """
+    Yields the user's partitions of start_date..end_date newest day first,
+    loading unchanged days from PARTITION_DIR and rebuilding the rest.
+    """
+    signatures = day_signatures(conn, user, start_date, end_date)
+    for day in sorted(signatures, reverse=True):
+        partition = load_partition(user, day, signatures[day])
+        if partition is None:
+            partition = build_partition(conn, user, day, signatures[day])
+            save_partition(partition)
+            metrics.count('partitions_built', user=user)
+        else:
+            metrics.count('partitions_cached', user=user)
+        yield partition
@@ -0,0 +1,75 @@
+import calendar
+import re
+from datetime import datetime, date
+
+from core.dates import MEXICO_TZ, local_date_window
+from core.filter_data import this_month_range
+
+
+class Period:
+    """
+    A report period of Mexico City calendar days, start_date through end_date.
+    `suffix` is appended to every output filename of the period, `title` goes
+    on its chart.
+    """
+
+    def __init__(self, start_date, end_date, name, suffix='', title=None):
+        if end_date < start_date:
+            raise ValueError(f"Period {name} ends before it starts")
+        self.start_date = start_date
+        self.end_date = end_date
+        self.name = name
+        self.suffix = suffix
+        self.title = title or name
+        self.since, self.until = local_date_window(start_date, end_date)
+
+    @property
+    def chart_filename(self):
+        if not self.suffix:
+            return 'bitso_this_month_income.png'
+        return f'bitso{self.suffix}_income.png'
+
+    def __repr__(self):
+        return f"Period({self.start_date} to {self.end_date}, {self.name!r})"
+
+
+def this_month():
+    start_date, end_date = this_month_range()
+    return Period(start_date, end_date, 'this month', title=start_date.strftime('%B %Y'))
+
+
+def month(year, month_number, suffix=None):
+    last_day = calendar.monthrange(year, month_number)[1]
+    start_date = date(year, month_number, 1)
+    if suffix is None:
+        suffix = f'_{start_date:%Y-%m}'
+    return Period(start_date, date(year, month_number, last_day), start_date.strftime('%B %Y'), suffix)
+
+
+def last_month():
+    today_local = datetime.now(MEXICO_TZ).date()
+    year, month_number = (today_local.year, today_local.month - 1) if today_local.month > 1 else (today_local.year - 1, 12)
+    return month(year, month_number)
+
+
+def parse_periods(text):
+    """
+    Parses one --period argument into a list of periods:
+    this-month, last-month, YYYY (twelve monthly periods), YYYY-MM,
+    or YYYY-MM-DD:YYYY-MM-DD.
+    """
+    text = text.strip()
+    if text == 'this-month':
+        return [this_month()]
+    if text == 'last-month':
+        return [last_month()]
+    if re.fullmatch(r'\d{4}', text):
+        return [month(int(text), m) for m in range(1, 13)]
+    if re.fullmatch(r'\d{4}-\d{2}', text):
+        year, month_number = map(int, text.split('-'))
+        return [month(year, month_number)]
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}:\d{4}-\d{2}-\d{2}', text):
+        start_str, end_str = text.split(':')
+        start_date, end_date = date.fromisoformat(start_str), date.fromisoformat(end_str)
+        return [Period(start_date, end_date, f'{start_date} to {end_date}', f'_{start_date}_{end_date}')]
+    raise ValueError(f"Unrecognised period: {text}")
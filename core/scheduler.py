@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+
+# Bitso allows 300 requests per minute per API key on private endpoints
+RATE_LIMIT_PER_MINUTE = getattr(config, 'RATE_LIMIT_PER_MINUTE', 300)
+MAX_CONCURRENT_ACCOUNTS = getattr(config, 'MAX_CONCURRENT_ACCOUNTS', 4)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every request made with one API key. `acquire`
+    blocks the calling thread only, so other accounts keep going.
+    """
+
+    def __init__(self, rate, per=60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+def run_accounts(api_keys, worker, max_workers=MAX_CONCURRENT_ACCOUNTS, rate_limit=RATE_LIMIT_PER_MINUTE):
+    """
+    Runs worker(user, api_key, api_secret, rate_limiter=...) for every account
+    at once, at most `max_workers` at a time. Yields (user, result, error) in
+    the order accounts finish; error is None when the worker succeeded.
+    """
+    limiters = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for user, (api_key, api_secret) in api_keys.items():
+            if api_key not in limiters:
+                limiters[api_key] = RateLimiter(rate_limit)
+            limiter = limiters[api_key]
+            future = executor.submit(worker, user, api_key, api_secret, rate_limiter=limiter)
+            futures[future] = user
+
+        for future in as_completed(futures):
+            user = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Account {user} failed: {e}")
+                yield user, None, e
+            else:
+                print(f"Account {user} finished")
+                yield user, result, None
@@ -0,0 +1,204 @@
+import difflib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import config
+
+# Where the payer index is kept between runs
+SENDER_INDEX = getattr(config, 'SENDER_INDEX', 'bitso_sender_index.json')
+
+# How close (0-1, difflib ratio) an unseen sender name must be to a known one to count as the same payer;
+# 1 turns fuzzy matching off
+SENDER_FUZZY_CUTOFF = getattr(config, 'SENDER_FUZZY_CUTOFF', 0.92)
+
+# RFCs the SAT hands out to the general public and to foreigners; shared by unrelated payers
+GENERIC_RFCS = {'XAXX010101000', 'XEXX010101000'}
+
+
+def normalize_name(name):
+    """'José  Ángel Muñoz.' -> 'jose angel munoz': no accents, case, punctuation or repeated spaces."""
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', stripped.casefold()).split())
+
+
+def normalize_rfc(rfc):
+    """Upper-case RFC (12/13 characters) or CURP (18), or '' when it is neither or a generic RFC."""
+    rfc = re.sub(r'[^0-9A-Za-z&Ññ]', '', rfc or '').upper()
+    if len(rfc) not in (12, 13, 18) or rfc in GENERIC_RFCS:
+        return ''
+    return rfc
+
+
+def _match_words(name):
+    # Short words (de, la, sa, cv) are shared by too many unrelated names to narrow anything down
+    return {word for word in name.split() if len(word) > 3}
+
+
+class SenderIndex:
+    """
+    Maps sender CLABEs, RFC/CURPs and normalized names to one canonical payer,
+    so a payer seen under several accounts or spellings sums into one row.
+    Payers are found by those keys alone and named after the first name (or
+    CLABE) they were seen with; config.ACCOUNT only relabels a payer one of
+    whose CLABEs it lists. A name, exact or fuzzy, only joins a payer whose
+    RFC/CURPs do not contradict the record's. Every key resolved is
+    remembered, and the index is saved, so later runs resolve the same way
+    and only new keys cost a lookup.
+    """
+
+    def __init__(self, path=SENDER_INDEX, fuzzy_cutoff=SENDER_FUZZY_CUTOFF):
+        self.path = path
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.clabes = {}
+        self.rfcs = {}
+        self.names = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            self.clabes, self.rfcs, self.names = saved['clabe'], saved['rfc'], saved['name']
+
+        # Derived from the three maps above, so not saved
+        self.payers = set(self.clabes.values()) | set(self.rfcs.values()) | set(self.names.values())
+        self.payer_rfcs = defaultdict(set)
+        for rfc, payer in self.rfcs.items():
+            self.payer_rfcs[payer].add(rfc)
+        self.payer_clabes = defaultdict(set)
+        for clabe, payer in self.clabes.items():
+            self.payer_clabes[payer].add(clabe)
+        # Known names by each word they contain; fuzzy matching only compares names sharing words
+        self.name_buckets = defaultdict(set)
+        for name in self.names:
+            self._bucket(name)
+
+    def _bucket(self, name):
+        for word in _match_words(name):
+            self.name_buckets[word].add(name)
+
+    def _candidates(self, name):
+        # Names sharing all but one of this name's words, so a single misspelt word still matches
+        words = _match_words(name)
+        needed = max(1, len(words) - 1)
+        # Such a name holds at least one of any len(words) - needed + 1 of them: take the rarest
+        rarest = sorted(words, key=lambda word: len(self.name_buckets.get(word, ())))[:len(words) - needed + 1]
+        pool = set().union(*(self.name_buckets.get(word, ()) for word in rarest))
+        return [candidate for candidate in pool
+                if candidate != name and len(words & _match_words(candidate)) >= needed]
+
+    def _accepts(self, payer, rfc):
+        # A valid RFC/CURP that differs from every one the payer is known by means another person
+        return not rfc or not self.payer_rfcs[payer] or rfc in self.payer_rfcs[payer]
+
+    def _match_name(self, name, rfc):
+        if not name:
+            return None
+        payer = self.names.get(name)
+        if payer and self._accepts(payer, rfc):
+            return payer
+        if self.fuzzy_cutoff >= 1:
+            return None
+
+        for match in difflib.get_close_matches(name, self._candidates(name), n=3, cutoff=self.fuzzy_cutoff):
+            if self._accepts(self.names[match], rfc):
+                return self.names[match]
+        return None
+
+    def _new_payer(self, clabe, name, rfc, rfc_key):
+        label = next((value.strip() for value in (name, clabe, rfc_key, rfc) if value and value.strip()), None)
+        if label in self.payers:
+            # Same name, different person: told apart by their RFC/CURP or CLABE
+            label = f'{label} ({rfc_key or clabe or len(self.payers)})'
+        return label
+
+    def _remember(self, mapping, key, payer):
+        # First payer wins, so a key never moves between payers from one run to the next
+        if key and key not in mapping:
+            mapping[key] = payer
+            self.dirty = True
+            if mapping is self.rfcs:
+                self.payer_rfcs[payer].add(key)
+            elif mapping is self.clabes:
+                self.payer_clabes[payer].add(key)
+            elif mapping is self.names:
+                self._bucket(key)
+
+    def label(self, payer):
+        """The name a payer is shown under: its config.ACCOUNT entry when one of its CLABEs has one."""
+        listed = sorted(clabe for clabe in self.payer_clabes.get(payer, ()) if clabe in config.ACCOUNT)
+        return config.ACCOUNT[listed[0]] if listed else payer
+
+    def resolve(self, clabe=None, name=None, rfc=None):
+        """The label of the payer for one sender, or None when the record names no sender at all."""
+        payer = self.resolve_payer(clabe, name, rfc)
+        return None if payer is None else self.label(payer)
+
+    def resolve_payer(self, clabe=None, name=None, rfc=None):
+        """The canonical payer for one sender, before labelling; None when the record names no sender."""
+        name_key = normalize_name(name)
+        rfc_key = normalize_rfc(rfc)
+        with self._lock:
+            payer = ((clabe and self.clabes.get(clabe)) or (rfc_key and self.rfcs.get(rfc_key))
+                     or self._match_name(name_key, rfc_key))
+            if not payer:
+                payer = self._new_payer(clabe, name, rfc, rfc_key)
+            if not payer:
+                return None
+
+            self.payers.add(payer)
+            self._remember(self.clabes, clabe, payer)
+            self._remember(self.rfcs, rfc_key, payer)
+            self._remember(self.names, name_key, payer)
+            return payer
+
+    def save(self):
+        if not (self.path and self.dirty):
+            return
+        with self._lock:
+            temp = f'{self.path}.tmp'
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({'clabe': self.clabes, 'rfc': self.rfcs, 'name': self.names}, f,
+                          ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temp, self.path)
+            self.dirty = False
+
+
+_sender_index = None
+_sender_index_lock = threading.Lock()
+
+
+def get_sender_index():
+    """The run's SenderIndex, loaded from SENDER_INDEX on first use."""
+    global _sender_index
+    with _sender_index_lock:
+        if _sender_index is None:
+            _sender_index = SenderIndex()
+        return _sender_index
+
+
+def resolve_sender_totals(totals):
+    """
+    Folds totals keyed by raw (CLABE, name, RFC/CURP) into totals per payer,
+    summing the exact integer units, and saves whatever the index learnt.
+    """
+    index = get_sender_index()
+    by_payer = {}
+    # Sorted, so the payers a first run creates do not depend on which account finished first
+    for (clabe, name, rfc), units in sorted(totals.items(), key=lambda item: tuple(v or '' for v in item[0])):
+        payer = index.resolve_payer(clabe, name, rfc)
+        by_payer[payer] = by_payer.get(payer, 0) + units
+    index.save()
+
+    # Labelled once every key is linked, so a payer is shown under one name however its keys came in
+    resolved = {}
+    for payer, units in by_payer.items():
+        label = index.label(payer)
+        resolved[label] = resolved.get(label, 0) + units
+    return resolved
@@ -0,0 +1,203 @@
+import sqlite3
+
+from core import jsonfast
+import config
+
+DEFAULT_DB_PATH = getattr(config, 'FUNDINGS_DB', 'bitso_fundings.db')
+
+# Reports read the store in batches this big so the per-batch columnar work pays off
+READ_BATCH_SIZE = getattr(config, 'READ_BATCH_SIZE', 5000)
+
+# created_at values that start like the API layout (core.dates.API_DATE_FORMAT); the
+# created_at ranges below can only ever match these
+API_DATE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T*'
+
+# Statuses Bitso can still move to complete/failed after we first store them
+MUTABLE_STATUSES = ('pending', 'in_progress')
+
+
+def open_store(path=None):
+    conn = sqlite3.connect(path or DEFAULT_DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fundings (
+            user TEXT NOT NULL,
+            fid TEXT NOT NULL,
+            created_at TEXT,
+            status TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (user, fid)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fundings_user_created ON fundings (user, created_at)")
+    # The store holds every record created between covered_from and covered_to.
+    # An empty covered_from means the whole history back to the first funding.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_coverage (
+            user TEXT PRIMARY KEY,
+            covered_from TEXT NOT NULL,
+            covered_to TEXT NOT NULL
+        )
+    """)
+    # Progress of a full-history backfill: every page up to `marker` (the fid of the oldest
+    # funding stored so far) is in fundings. Written in the same transaction as the page.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoint (
+            user TEXT PRIMARY KEY,
+            marker TEXT NOT NULL,
+            pages INTEGER NOT NULL,
+            records INTEGER NOT NULL,
+            newest TEXT NOT NULL,
+            complete INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def get_coverage(conn, user):
+    row = conn.execute("SELECT covered_from, covered_to FROM sync_coverage WHERE user = ?", (user,)).fetchone()
+    return row if row else (None, None)
+
+
+def _set_coverage(conn, user, covered_from, covered_to):
+    conn.execute(
+        "INSERT INTO sync_coverage (user, covered_from, covered_to) VALUES (?, ?, ?) "
+        "ON CONFLICT (user) DO UPDATE SET covered_from = excluded.covered_from, covered_to = excluded.covered_to",
+        (user, covered_from, covered_to)
+    )
+
+
+def set_coverage(conn, user, covered_from, covered_to):
+    _set_coverage(conn, user, covered_from, covered_to)
+    conn.commit()
+
+
+def oldest_mutable_created_at(conn, user, since):
+    """
+    Returns the created_at of the oldest record for the user that is still in a
+    mutable status and was created on or after `since`, or None.
+    """
+    placeholders = ', '.join('?' for _ in MUTABLE_STATUSES)
+    row = conn.execute(
+        f"SELECT MIN(created_at) FROM fundings WHERE user = ? AND created_at >= ? AND status IN ({placeholders})",
+        (user, since, *MUTABLE_STATUSES)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def has_funding(conn, user, fid):
+    return conn.execute("SELECT 1 FROM fundings WHERE user = ? AND fid = ?", (user, fid)).fetchone() is not None
+
+
+def stored_statuses(conn, user, fids):
+    """{fid: status} of those of `fids` the user has stored."""
+    fids = list(fids)
+    placeholders = ', '.join('?' for _ in fids)
+    return dict(conn.execute(
+        f"SELECT fid, status FROM fundings WHERE user = ? AND fid IN ({placeholders})", (user, *fids)
+    ))
+
+
+def iter_statuses(conn, user, since, until):
+    """(created_at, fid, status) of the user's fundings created in [since, until), by fid; no JSON is decoded."""
+    return conn.execute(
+        "SELECT created_at, fid, status FROM fundings WHERE user = ? AND created_at >= ? AND created_at < ? "
+        "ORDER BY fid",
+        (user, since, until)
+    )
+
+
+def iter_undated(conn, user):
+    """
+    (fid, created_at) of the user's fundings whose created_at is missing or
+    does not match API_DATE_GLOB, so no created_at range ever selects them.
+    """
+    return conn.execute(
+        "SELECT fid, created_at FROM fundings WHERE user = ? "
+        "AND (created_at IS NULL OR created_at NOT GLOB ?) ORDER BY fid",
+        (user, API_DATE_GLOB)
+    )
+
+
+def _upsert(conn, user, fundings):
+    conn.executemany(
+        """
+        INSERT INTO fundings (user, fid, created_at, status, data) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user, fid) DO UPDATE SET
+            created_at = excluded.created_at,
+            status = excluded.status,
+            data = excluded.data
+        """,
+        [(user, f['fid'], f.get('created_at'), f.get('status'), jsonfast.dumps(f)) for f in fundings]
+    )
+
+
+def upsert_fundings(conn, user, fundings):
+    _upsert(conn, user, fundings)
+    conn.commit()
+
+
+def get_checkpoint(conn, user):
+    """(marker, pages, records, newest, complete) of the user's backfill, or None before it starts."""
+    return conn.execute(
+        "SELECT marker, pages, records, newest, complete FROM backfill_checkpoint WHERE user = ?", (user,)
+    ).fetchone()
+
+
+def save_backfill_page(conn, user, fundings, pages, records, newest):
+    """
+    Stores one backfill page and moves the checkpoint past it in a single
+    transaction, so after a crash the store holds either both or neither.
+    """
+    with conn:
+        _upsert(conn, user, fundings)
+        conn.execute(
+            "INSERT INTO backfill_checkpoint (user, marker, pages, records, newest) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user) DO UPDATE SET marker = excluded.marker, pages = excluded.pages, "
+            "records = excluded.records",
+            (user, fundings[-1]['fid'], pages, records, newest)
+        )
+
+
+def complete_backfill(conn, user, newest):
+    """
+    Marks the backfill done and records that the store now holds the whole
+    history up to `newest`, merged with what earlier syncs covered.
+    """
+    covered_from, covered_to = get_coverage(conn, user)
+    # A synced range that starts after `newest` leaves a gap, so only a range reaching back to it is kept
+    if covered_from is not None and covered_from <= newest:
+        newest = max(newest, covered_to)
+    with conn:
+        _set_coverage(conn, user, '', newest)
+        conn.execute("UPDATE backfill_checkpoint SET complete = 1 WHERE user = ?", (user,))
+
+
+def reset_backfill(conn, user):
+    with conn:
+        conn.execute("DELETE FROM backfill_checkpoint WHERE user = ?", (user,))
+
+
+def iter_fundings(conn, user, since=None, until=None, page_size=100):
+    """
+    Yields the user's stored fundings newest-first in lists of `page_size`,
+    the same order and shape the API pages come in. since/until are API
+    formatted UTC strings; until is exclusive.
+    """
+    query = "SELECT data FROM fundings WHERE user = ?"
+    args = [user]
+    if since:
+        query += " AND created_at >= ?"
+        args.append(since)
+    if until:
+        query += " AND created_at < ?"
+        args.append(until)
+
+    cursor = conn.execute(query + " ORDER BY created_at DESC, fid DESC", args)
+    while True:
+        rows = cursor.fetchmany(page_size)
+        if not rows:
+            break
+        yield [jsonfast.loads(data) for (data,) in rows]
+
@@ -0,0 +1,208 @@
+import calendar
+import time
+from datetime import date
+
+from core import store
+from core.client import FetchError
+from core.fetch_funding import iter_funding_pages, sync_fundings_for_user, get_default_client
+from core.store import READ_BATCH_SIZE
+from core.dates import to_api_string
+from core.periods import Period, this_month
+from core.scheduler import RateLimiter, RATE_LIMIT_PER_MINUTE
+from core.filter_data import period_mask
+from core.filter_sender import GroupedTotals, SUMMARY_GROUPINGS, to_units, from_units
+from core.flatten import flatten_fundings
+from core.export import open_funding_writer
+from core.chart import render_growth_charts
+import config
+
+# Polling backs off from WATCH_MIN_INTERVAL to WATCH_MAX_INTERVAL seconds while nothing changes
+WATCH_MIN_INTERVAL = getattr(config, 'WATCH_MIN_INTERVAL', 5)
+WATCH_MAX_INTERVAL = getattr(config, 'WATCH_MAX_INTERVAL', 60)
+WATCH_BACKOFF = 1.5
+
+# Newest-page polls cannot see pending deposits settling further down, so a full sync runs this often
+WATCH_RECHECK_INTERVAL = getattr(config, 'WATCH_RECHECK_INTERVAL', 300)
+
+
+def current_month():
+    """The whole current Mexico City month, named and titled like this_month() so filenames match."""
+    start_date = this_month().start_date
+    last_day = calendar.monthrange(start_date.year, start_date.month)[1]
+    end_date = date(start_date.year, start_date.month, last_day)
+    return Period(start_date, end_date, 'this month', title=start_date.strftime('%B %Y'))
+
+
+class LiveTotals:
+    """
+    The combined outputs of one period, kept in memory and updated record by
+    record: the summaries of filter_sender_name, the daily income behind the
+    chart and the failed deposits. A funding seen again with another status
+    or amount has its old contribution taken back out before the new one
+    goes in, so pending deposits that settle are counted exactly once.
+    """
+
+    def __init__(self, period, groupings=SUMMARY_GROUPINGS):
+        self.period = period
+        self.totals = GroupedTotals(groupings)
+        self.daily_units = {}
+        self.failed = {}
+        self.seen = {}
+        self.dirty = False
+
+    def _apply_daily(self, table, sign):
+        complete = table[table['Status'] == 'complete']
+        if complete.empty:
+            return
+        units = complete['Amount'].map(to_units)
+        valid = units.notna()
+        units = units[valid].astype(object)
+        for day, amount in units.groupby(complete['created_local'][valid].dt.date).sum().items():
+            self.daily_units[day] = self.daily_units.get(day, 0) + sign * int(amount)
+
+    def _apply(self, table, sign):
+        if table.empty:
+            return
+        self.totals.add_table(table, sign)
+        self._apply_daily(table, sign)
+
+    def apply(self, user, fundings):
+        """Folds a page of the user's fundings in. Returns how many records changed the outputs."""
+        period = self.period
+        fundings = list(fundings)
+        table = flatten_fundings(fundings, report_bad=False, user=user)
+        in_period = period_mask(table['created_local'], period.start_date, period.end_date).to_numpy()
+
+        changed = [False] * len(fundings)
+        removed = []
+        for i, (record, keep) in enumerate(zip(fundings, in_period)):
+            key = (user, record.get('fid'))
+            previous = self.seen.get(key)
+            if not keep or (previous is not None and previous.get('status') == record.get('status')
+                            and previous.get('amount') == record.get('amount')):
+                continue
+            if previous is not None:
+                removed.append(previous)
+            changed[i] = True
+            self.seen[key] = record
+            if record.get('status') == 'failed':
+                self.failed[key] = record
+            else:
+                self.failed.pop(key, None)
+
+        if not any(changed):
+            return 0
+        if removed:
+            self._apply(flatten_fundings(removed, report_bad=False, user=user), -1)
+        self._apply(table[changed], 1)
+        self.dirty = True
+        return sum(changed)
+
+    def load(self, conn, user):
+        since, until = to_api_string(self.period.since), to_api_string(self.period.until)
+        for page in store.iter_fundings(conn, user, since, until, READ_BATCH_SIZE):
+            self.apply(user, page)
+
+    def snapshot(self):
+        return self.totals.totals, self.daily_units, set(self.failed)
+
+    def daily_income(self):
+        return {day: float(from_units(units)) for day, units in self.daily_units.items() if units}
+
+    def flush(self, fmt=None):
+        period = self.period
+        self.totals.write_all(f'_all{period.suffix}', fmt)
+
+        failed = open_funding_writer(
+            f'bitso_failed_deposits_all{period.suffix}.csv', 'Failed deposit summary', create_empty=False, fmt=fmt
+        )
+        for user in sorted({user for user, _ in self.failed}):
+            records = [f for (owner, _), f in self.failed.items() if owner == user]
+            records.sort(key=lambda f: (f.get('created_at') or '', f.get('fid') or ''), reverse=True)
+            failed.write_table(flatten_fundings(records, report_bad=False, user=user))
+        failed.close()
+
+        render_growth_charts([(self.daily_income(), period.title, period.chart_filename, period.name)])
+        self.dirty = False
+
+
+def poll_newest(live, user, api_key, api_secret, conn, client=None, rate_limiter=None):
+    """
+    Fetches the newest page, and older ones only while every record on them is
+    new to the store, then folds them into `live`. Returns the number of
+    records that changed an output.
+    """
+    since_str = to_api_string(live.period.since)
+    covered_from, covered_to = store.get_coverage(conn, user)
+
+    changed = 0
+    newest = None
+    for fundings in iter_funding_pages(user, api_key, api_secret, client, rate_limiter):
+        oldest = fundings[-1]
+        overlaps = store.has_funding(conn, user, oldest['fid'])
+        store.upsert_fundings(conn, user, fundings)
+        changed += live.apply(user, fundings)
+        newest = newest or fundings[0].get('created_at') or ''
+
+        if overlaps or (oldest.get('created_at') or '') < since_str:
+            if overlaps and covered_to is not None and (oldest.get('created_at') or '') <= covered_to:
+                # The pages joined up with the stored range, which therefore now reaches `newest`
+                store.set_coverage(conn, user, covered_from, max(newest, covered_to))
+            break
+    return changed
+
+
+def watch(fmt=None, min_interval=WATCH_MIN_INTERVAL, max_interval=WATCH_MAX_INTERVAL,
+          recheck_interval=WATCH_RECHECK_INTERVAL, cycles=None):
+    """
+    Follows the current month: polls the newest page of every account, backing
+    off while nothing changes, and rewrites the combined summaries, failed
+    deposits and chart only after a poll changed them. Every `recheck_interval`
+    seconds, and when the month turns, it runs a full sync and rebuilds the
+    totals from the store. `cycles` limits the number of polls, for testing.
+    """
+    conn = store.open_store()
+    client = get_default_client()
+    accounts = {user: keys for user, keys in config.API_KEYS.items() if keys[0] and keys[1]}
+    limiters = {api_key: RateLimiter(RATE_LIMIT_PER_MINUTE) for api_key, _ in accounts.values()}
+
+    live = None
+    last_sync = 0.0
+    interval = min_interval
+    cycle = 0
+    while cycles is None or cycle < cycles:
+        cycle += 1
+        period = current_month()
+        changed = 0
+
+        if live is None or live.period.start_date != period.start_date or \
+                time.monotonic() - last_sync >= recheck_interval:
+            rebuilt = LiveTotals(period)
+            for user, (api_key, api_secret) in accounts.items():
+                try:
+                    sync_fundings_for_user(user, api_key, api_secret, conn, since=period.since,
+                                           client=client, rate_limiter=limiters[api_key])
+                except FetchError as e:
+                    print(f"Sync failed for {user}: {e}")
+                rebuilt.load(conn, user)
+            if live is None or rebuilt.period.start_date != live.period.start_date or \
+                    rebuilt.snapshot() != live.snapshot():
+                changed = len(rebuilt.seen)
+            live = rebuilt
+            live.dirty = bool(changed)
+            last_sync = time.monotonic()
+        else:
+            for user, (api_key, api_secret) in accounts.items():
+                try:
+                    changed += poll_newest(live, user, api_key, api_secret, conn, client, limiters[api_key])
+                except FetchError as e:
+                    print(f"Poll failed for {user}: {e}")
+
+        if live.dirty:
+            print(f"\n{changed} new or updated fundings. Updating outputs for {period.name}...")
+            live.flush(fmt)
+
+        if cycles is not None and cycle >= cycles:
+            break
+        interval = min_interval if changed else min(max_interval, interval * WATCH_BACKOFF)
+        time.sleep(interval)
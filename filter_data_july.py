@@ -1,30 +1,20 @@
-import pytz
-from datetime import datetime, date
-import pandas as pd
-from dateutil import parser
+from datetime import date, datetime
+
+from core.dates import MEXICO_TZ
+from core.filter_data import select_fundings_between
+
+def july_range():
+    # The most recent July that has ended, in Mexico City time: this year's from August on, else last year's
+    today_local = datetime.now(MEXICO_TZ).date()
+    year = today_local.year if today_local.month > 7 else today_local.year - 1
+    return date(year, 7, 1), date(year, 7, 31)
 
 def filter_fundings_july(fundings):
-    mexico_tz = pytz.timezone('America/Mexico_City')
-    
-    # We are in August 2025, so we need to get data for July 2025
-    current_year = 2025
-    start_date = date(current_year, 7, 1)
-    end_date = date(current_year, 7, 31)
+    start_date, end_date = july_range()
 
     print(f"Filtering fundings from {start_date} to {end_date} (Mexico City time)")
 
-    filtered = []
-    for f in fundings:
-        created_str = f.get('created_at')
-        if not created_str:
-            continue
-
-        try:
-            created_local = parser.isoparse(created_str).astimezone(mexico_tz).date()
-            if start_date <= created_local <= end_date:
-                filtered.append(f)
-        except Exception as e:
-            print(f"Skipping record with bad date format: {created_str} ({e})")
+    filtered = select_fundings_between(fundings, start_date, end_date)
 
     print(f"Filtered down to {len(filtered)} funding transactions")
-    return filtered
\ No newline at end of file
+    return filtered
@@ -0,0 +1,311 @@
+import argparse
+import multiprocessing
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from core.fetch_funding import sync_fundings_for_user, get_default_client
+from core.store import open_store, iter_undated
+from core.scheduler import run_accounts
+from core.periods import parse_periods
+from core.export import FORMATS, open_funding_writer, failed_view
+from core.metrics import metrics, set_verbose, is_verbose, METRICS_JSON, METRICS_PROMETHEUS
+import config
+
+# Worker processes for the post-fetch stages; 1 keeps them in this process
+REPORT_PROCESSES = getattr(config, 'REPORT_PROCESSES', 1)
+
+
+class PeriodReport:
+    """
+    The combined, all-account outputs of one period, filled in account by
+    account. Nothing is written before finish(), so a run with a failed
+    account can leave the previous combined outputs as they were.
+    """
+
+    def __init__(self, period, fmt=None):
+        from core.filter_sender import GroupedTotals, SUMMARY_GROUPINGS
+
+        self.period = period
+        self.fmt = fmt
+        self.totals = GroupedTotals(SUMMARY_GROUPINGS)
+        self.daily_income = defaultdict(float)
+        self.count = 0
+        # Failed deposits are few; held until finish() writes them all at once
+        self._failed = []
+
+    def add(self, partition, failed):
+        if not failed.empty:
+            self._failed.append(failed)
+        with metrics.span('aggregate', period=self.period.name):
+            self.totals.merge(partition.totals)
+            for day, amount in partition.daily_income.items():
+                self.daily_income[day] += amount
+        self.count += len(partition.table)
+
+    def merge(self, result):
+        """Folds in one worker's PartialReport.result() for this period."""
+        if result['failed'] is not None:
+            from core.export_arrow import from_ipc_buffer
+            self._failed.append(from_ipc_buffer(result['failed']))
+        with metrics.span('aggregate', period=self.period.name):
+            self.totals.merge(result['totals'])
+            for day, amount in result['daily_income'].items():
+                self.daily_income[day] += amount
+        self.count += result['count']
+        metrics.merge(result['metrics'])
+
+    def finish(self):
+        period = self.period
+        for_period = f' for {period.name}' if period.suffix else ''
+
+        if not self.count:
+            print(f"\nNo data found for any user{for_period}.")
+            return None
+
+        print(f"\nGenerating combined summary for all accounts{for_period}...")
+        with metrics.span('aggregate', period=period.name):
+            self.totals.write_all(f'_all{period.suffix}', self.fmt)
+
+        print(f"\nGenerating combined summary of failed deposits for all accounts{for_period}...")
+        with metrics.span('export', period=period.name):
+            failed_all = open_funding_writer(
+                f'bitso_failed_deposits_all{period.suffix}.csv', 'Failed deposit summary',
+                create_empty=False, fmt=self.fmt
+            )
+            for failed in self._failed:
+                failed_all.write_table(failed)
+            closed = failed_all.close()
+        if not closed:
+            print("No failed fundings to export.")
+
+        # The growth chart of all funding data; run_report renders every period's in one batch
+        return self.daily_income, period.title, period.chart_filename, period.name
+
+
+class PartialReport:
+    """
+    One worker process's share of a PeriodReport, for one user and period.
+    Totals stay exact integer units; failed rows go back as an Arrow IPC
+    buffer rather than pickled records.
+    """
+
+    def __init__(self, period):
+        from core.filter_sender import GroupedTotals, SUMMARY_GROUPINGS
+
+        self.period = period
+        self.totals = GroupedTotals(SUMMARY_GROUPINGS)
+        self.daily_income = defaultdict(float)
+        self.count = 0
+        self._failed = []
+
+    def add(self, partition, failed):
+        if not failed.empty:
+            self._failed.append(failed)
+        with metrics.span('aggregate', period=self.period.name):
+            self.totals.merge(partition.totals)
+            for day, amount in partition.daily_income.items():
+                self.daily_income[day] += amount
+        self.count += len(partition.table)
+
+    def result(self):
+        failed = None
+        if self._failed:
+            import pandas as pd
+            from core.export_arrow import to_ipc_buffer
+            failed = to_ipc_buffer(pd.concat(self._failed)).to_pybytes()
+        return {
+            'totals': self.totals.totals,
+            'daily_income': dict(self.daily_income),
+            'count': self.count,
+            'failed': failed,
+            'metrics': metrics.state(),
+        }
+
+
+def process_user_period(user: str, period, fmt=None, verbose=True):
+    """Worker process entry: one user's outputs for one period, read straight from the store."""
+    set_verbose(verbose)
+    metrics.reset()
+    partial_report = PartialReport(period)
+    process_user_funding(user, open_store(), [partial_report], fmt)
+    return partial_report.result()
+
+
+def sync_user_funding(user: str, api_key: str, api_secret: str, since=None, rate_limiter=None) -> bool:
+
+    print(f"\nSyncing user: {user}")
+
+    if not api_key or not api_secret:
+        print(f"Missing credentials for {user}. Skipping...")
+        return False
+
+    with metrics.span('sync', user=user):
+        sync_fundings_for_user(user, api_key, api_secret, open_store(), since=since, rate_limiter=rate_limiter)
+    return True
+
+
+def report_undated(user: str, conn):
+    """Reports, once per run, the user's stored fundings left out of every period for a missing or malformed date."""
+    for fid, created_at in iter_undated(conn, user):
+        if created_at is None:
+            print(f"Skipping record with no date: {fid}")
+        else:
+            print(f"Skipping record with bad date format: {created_at}")
+
+
+def process_user_funding(user: str, conn, reports: list, fmt=None):
+    """
+    Goes through the user's stored fundings day by day, covering every
+    period, and adds each day to the per-user exports and combined reports of
+    the periods it falls in. Days unchanged since the last run come from their
+    cached partitions (see core.partitions) instead of the store.
+    """
+    # The report stages pull in pandas, which the sync before them does not need
+    from core.partitions import iter_day_partitions
+
+    print(f"\nProcessing user: {user}")
+
+    outputs = []
+    for report in reports:
+        period = report.period
+        print(f"Filtering fundings from {period.start_date} to {period.end_date} (Mexico City time)")
+        deposits = open_funding_writer(
+            f'bitso_deposits_{user}{period.suffix}.csv', 'Deposit summary', fmt=fmt, user=user
+        )
+        failed = open_funding_writer(
+            f'bitso_failed_deposits_{user}{period.suffix}.csv', 'Failed deposit summary',
+            create_empty=False, fmt=fmt, user=user
+        )
+        outputs.append((report, deposits, failed))
+
+    start_date = min(report.period.start_date for report in reports)
+    end_date = max(report.period.end_date for report in reports)
+    # Newest day first, so the exports keep the newest-first order of the store
+    for partition in iter_day_partitions(conn, user, start_date, end_date):
+        table = partition.table
+        if table.empty:
+            continue
+        with metrics.span('filter', user=user):
+            day_failed = failed_view(table)
+
+        # A day lies wholly inside or outside each period, so its partition is added as it is
+        for report, deposits, failed in outputs:
+            period = report.period
+            if not period.start_date <= partition.day <= period.end_date:
+                continue
+
+            with metrics.span('export', user=user):
+                deposits.write_table(table)
+                failed.write_table(day_failed)
+            report.add(partition, day_failed)
+
+    for report, deposits, failed in outputs:
+        print(f"Filtered down to {deposits.rows} funding transactions for {report.period.name}")
+        with metrics.span('export', user=user):
+            deposits.close()
+            closed = failed.close()
+        if not closed:
+            print("No failed fundings to export.")
+
+
+def run_report(periods: list, fmt=None, metrics_json=METRICS_JSON, prometheus=METRICS_PROMETHEUS, force=False,
+               processes=REPORT_PROCESSES):
+    """
+    Syncs every account and writes the per-account and combined outputs of
+    each period. Returns the accounts whose sync failed; when there are any,
+    the combined outputs and charts are not written, as their totals would
+    leave those accounts out.
+    """
+    metrics.reset()
+    conn = open_store()
+    reports = [PeriodReport(period, fmt) for period in periods]
+
+    # Each (user, period) is its own task on the pool, reading only its window of the store.
+    # spawn, not fork: the account threads and their HTTP pool are running by then.
+    pool = None
+    if processes > 1:
+        pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+    tasks = []
+
+    # One sync per account, reaching back to the earliest period
+    sync = partial(sync_user_funding, since=min(period.since for period in periods))
+
+    # Accounts sync concurrently; each is exported as soon as its sync finishes
+    failed_users = []
+    for user, synced, error in run_accounts(config.API_KEYS, sync):
+        if error:
+            failed_users.append(user)
+        if error or not synced:
+            continue
+        report_undated(user, conn)
+        if pool:
+            tasks += [(report, pool.submit(process_user_period, user, report.period, fmt, is_verbose()))
+                      for report in reports]
+        else:
+            process_user_funding(user, conn, reports, fmt)
+
+    if pool:
+        # Merged in submission order, so the combined outputs do not depend on which worker finishes first
+        for report, task in tasks:
+            report.merge(task.result())
+        pool.shutdown()
+
+    stats = get_default_client().stats
+    print(f"\nHTTP: {stats['requests']} requests, {stats['retries']} retries "
+          f"({stats['rate_limited']} rate limited), {stats['sleep_seconds']:.1f}s spent in backoff")
+
+    if failed_users:
+        print(f"\nWARNING: sync failed for {', '.join(sorted(failed_users))}. "
+              f"Combined outputs and charts were not written; the previous ones are left as they were.")
+    else:
+        from core.chart import render_growth_charts
+
+        charts = [chart for chart in (report.finish() for report in reports) if chart]
+        with metrics.span('chart'):
+            render_growth_charts(charts, force)
+
+    if metrics_json:
+        metrics.write_json(metrics_json)
+    if prometheus:
+        metrics.write_prometheus(prometheus)
+    return failed_users
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Builds Bitso deposit reports for one or more periods from a single fetch per account.'
+    )
+    parser.add_argument(
+        '-p', '--period', action='append', dest='periods', metavar='PERIOD',
+        help='this-month (default), last-month, YYYY (all twelve months), YYYY-MM or '
+             'YYYY-MM-DD:YYYY-MM-DD. Repeat for several periods.'
+    )
+    parser.add_argument('--format', choices=FORMATS, help='Output format (default: config.OUTPUT_FORMAT or csv)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print a line for every fetched page')
+    parser.add_argument('--metrics-json', default=METRICS_JSON, metavar='FILE',
+                        help=f'Run summary of stage timings and counters (default: {METRICS_JSON})')
+    parser.add_argument('--prometheus', default=METRICS_PROMETHEUS, metavar='FILE',
+                        help='Also write the metrics as a Prometheus textfile')
+    parser.add_argument('-j', '--processes', type=int, default=REPORT_PROCESSES,
+                        help=f'Worker processes for filtering, exports and summaries (default: {REPORT_PROCESSES})')
+    parser.add_argument('--force-charts', action='store_true',
+                        help='Redraw charts even when their daily income is unchanged since the last run')
+    args = parser.parse_args(argv)
+
+    if args.quiet:
+        set_verbose(False)
+
+    try:
+        periods = [period for text in (args.periods or ['this-month']) for period in parse_periods(text)]
+    except ValueError as e:
+        parser.error(str(e))
+
+    failed_users = run_report(periods, args.format, args.metrics_json, args.prometheus, args.force_charts,
+                              args.processes)
+    return 1 if failed_users else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import argparse
+
+from core.export import FORMATS
+from core.metrics import set_verbose
+from core.watcher import watch, WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL, WATCH_RECHECK_INTERVAL
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Follows this month\'s Bitso deposits, updating the combined outputs as they arrive.'
+    )
+    parser.add_argument('--format', choices=FORMATS, help='Output format (default: config.OUTPUT_FORMAT or csv)')
+    parser.add_argument('--min-interval', type=float, default=WATCH_MIN_INTERVAL,
+                        help=f'Seconds between polls after a change (default: {WATCH_MIN_INTERVAL})')
+    parser.add_argument('--max-interval', type=float, default=WATCH_MAX_INTERVAL,
+                        help=f'Longest wait between polls while nothing changes (default: {WATCH_MAX_INTERVAL})')
+    parser.add_argument('--recheck-interval', type=float, default=WATCH_RECHECK_INTERVAL,
+                        help=f'Seconds between full syncs that refresh pending deposits '
+                             f'(default: {WATCH_RECHECK_INTERVAL})')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print a line for every fetched page')
+    args = parser.parse_args(argv)
+
+    set_verbose(args.verbose)
+    try:
+        watch(args.format, args.min_interval, args.max_interval, args.recheck_interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+if __name__ == '__main__':
+    main()